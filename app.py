@@ -1,6 +1,16 @@
-from flask import Flask, render_template, jsonify, request, redirect, url_for, session
+from flask import Flask, render_template, jsonify, request, redirect, url_for, session, Response, stream_with_context, g
 import os
+import csv
+import hmac
+import io
+import json
+import queue
+import time
+from datetime import datetime, timezone
+from urllib.parse import quote
 import sheets_handler
+import live_updates
+import telemetry
 
 app = Flask(__name__, template_folder='templates', static_folder='static')
 # Secure secret key (in production, use env var)
@@ -20,6 +30,104 @@ PROGRESS_DB = {
 
 import sheets_handler
 
+HTTP_REQUESTS = telemetry.counter('http_requests_total', 'Requests answered, by route.', ['route', 'method', 'status'])
+HTTP_REQUEST_SECONDS = telemetry.histogram(
+    'http_request_duration_seconds', 'Time to build the response, by route.', ['route', 'method']
+)
+
+# Requests slower than this are logged with every Sheets call they made
+SLOW_REQUEST_SECONDS = float(os.environ.get('SLOW_REQUEST_SECONDS', '1.0'))
+# Off by default: the header names Sheets ranges and tabs to whoever made the request
+SERVER_TIMING_ENABLED = os.environ.get('SERVER_TIMING_ENABLED', '0') == '1'
+# Calls listed one by one in Server-Timing; the rest only count towards the total
+SERVER_TIMING_MAX_CALLS = 20
+# Bearer token Prometheus sends to /metrics; unset, only admins can read it
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+@app.before_request
+def _start_warm_up():
+    # Normally started by gunicorn's post_fork; this covers the dev server.
+    # Never at import: with --preload, a thread started in the master would
+    # leave every forked worker with copies of the locks it was holding.
+    sheets_handler.start_warm_up()
+
+@app.before_request
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+    g.trace_token = telemetry.start_trace()
+
+@app.after_request
+def _record_request(response):
+    started = g.get('request_started')
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    spans = telemetry.end_trace(g.pop('trace_token'))
+
+    # Label by the route pattern (/api/progress), not the raw path
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    HTTP_REQUESTS.inc(route, request.method, str(response.status_code))
+    HTTP_REQUEST_SECONDS.observe(elapsed, route, request.method)
+
+    if SERVER_TIMING_ENABLED:
+        response.headers['Server-Timing'] = _server_timing(elapsed, spans)
+    if elapsed >= SLOW_REQUEST_SECONDS:
+        _log_slow_request(route, response.status_code, elapsed, spans)
+    return response
+
+def _timing_desc(text):
+    # Header values must be latin-1; tab names are not, so percent-encode them
+    return quote(text, safe=" !#$&'()*+,/:;=?@[]~")
+
+def _server_timing(elapsed, spans):
+    sheets_ms = sum(span['ms'] for span in spans)
+    wait_ms = sum(span['wait_ms'] for span in spans)
+    received = sum(span['bytes'] for span in spans)
+    entries = [
+        f"app;dur={elapsed * 1000:.1f}",
+        f'sheets;dur={sheets_ms:.1f};desc="{len(spans)} calls, {received} bytes"',
+    ]
+    if wait_ms:
+        entries.append(f'quota;dur={wait_ms:.1f};desc="waiting for Sheets quota"')
+    for i, span in enumerate(spans[:SERVER_TIMING_MAX_CALLS], 1):
+        # Fan-out reads carry up to a hundred ranges; name the first one only
+        ranges = [r for r in span['ranges'] if r]
+        if len(ranges) > 1:
+            ranges = [ranges[0], f"+{len(ranges) - 1} ranges"]
+        desc = _timing_desc(' '.join([span['handler'], span['operation']] + ranges))
+        entries.append(f'sheets-{i};dur={span["ms"]:.1f};desc="{desc}"')
+    return ', '.join(entries)
+
+def _log_slow_request(route, status, elapsed, spans):
+    print(json.dumps({
+        'event': 'slow_request',
+        'method': request.method,
+        'path': request.path,
+        'route': route,
+        'status': status,
+        'ms': round(elapsed * 1000, 1),
+        'sheets_calls': len(spans),
+        'sheets_ms': round(sum(span['ms'] for span in spans), 1),
+        'sheets_bytes': sum(span['bytes'] for span in spans),
+        'calls': spans,
+    }, ensure_ascii=False), flush=True)
+
+@app.route('/healthz')
+def healthz():
+    # 503 while this worker is still warming up, so health checks can wait for it
+    status = sheets_handler.get_warm_up_status()
+    return jsonify(status), 200 if status['ready'] else 503
+
+@app.route('/metrics')
+def metrics():
+    # Prometheus scrape target; counts are per worker (see telemetry.py).
+    # Scrapers send METRICS_TOKEN as a bearer token; a logged-in admin can look too.
+    token = request.headers.get('Authorization', '').removeprefix('Bearer ')
+    scraper = bool(METRICS_TOKEN) and hmac.compare_digest(token, METRICS_TOKEN)
+    if not scraper and not session.get('admin_logged_in'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    return Response(telemetry.render(), content_type=telemetry.CONTENT_TYPE)
+
 @app.route('/')
 def index():
     # Redirect root to dashboard (which will redirect to login if needed)
@@ -60,6 +168,27 @@ def dashboard():
     # Pass student_id and student_name to template
     return render_template('dashboard.html', student_id=student_id, student_name=student_name)
 
+def _not_modified(etag, weak=False):
+    """
+    Answers a conditional GET from a cached ETag alone, or returns None if
+    the client's copy is missing or out of date.
+    """
+    if not etag or not request.if_none_match.contains_weak(etag):
+        return None
+    response = Response(status=304)
+    response.set_etag(etag, weak=weak)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def _json_with_etag(payload, etag, weak=False):
+    response = jsonify(payload)
+    if etag:
+        response.set_etag(etag, weak=weak)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        # Turns the response into a bodiless 304 if If-None-Match matches
+        response.make_conditional(request)
+    return response
+
 @app.route('/api/progress', methods=['GET'])
 def get_progress():
     # API Protection
@@ -68,18 +197,21 @@ def get_progress():
     
     if not student_id:
         return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+    not_modified = _not_modified(sheets_handler.peek_student_dashboard_etag(student_id))
+    if not_modified:
+        return not_modified
     
-    # Get Tasks
-    tasks = sheets_handler.get_tasks(student_id)
-    
-    # Get User Info (Goals, etc.)
-    user_info = sheets_handler.get_user_info(student_id)
+    # Tasks and User Info (Goals, etc.) come from the same tab, so fetch them in one round trip
+    dashboard = sheets_handler.get_student_dashboard(student_id)
+    tasks = dashboard['tasks']
+    user_info = dashboard['user_info']
     
-    return jsonify({
+    return _json_with_etag({
         "name": user_info.get("mentor", "Buzz Student"), 
         "tasks": tasks,
         "user_info": user_info
-    })
+    }, dashboard['etag'])
 
 @app.route('/api/progress', methods=['POST'])
 def update_progress():
@@ -88,6 +220,16 @@ def update_progress():
          
     data = request.json
     student_id = session['student_id']
+    if not isinstance(data, (dict, list)):
+        return jsonify({"status": "error", "message": "Expected an object or a list"}), 400
+
+    # A list (or {'updates': [...]}) updates several tasks in one write
+    updates = data.get('updates') if isinstance(data, dict) else data
+    if isinstance(updates, list):
+        if not updates:
+            return jsonify({"status": "error", "message": "No updates"}), 400
+        return _batch_response(sheets_handler.update_task_statuses(student_id, updates))
+
     task_id = data.get('task_id')
     status = data.get('status')
     
@@ -183,6 +325,92 @@ def delete_student():
     else:
         return jsonify({'error': 'Failed to delete student'}), 500
 
+def _batch_response(results):
+    """
+    Wraps per-item results of a batch operation. Items that were not sent
+    ('invalid', 'not_found') count as client errors, anything else as a failure.
+    """
+    failed = [r for r in results if r['status'] != 'success']
+    if not failed:
+        return jsonify({'status': 'success', 'results': results}), 200
+    if len(failed) < len(results):
+        return jsonify({'status': 'partial', 'results': results}), 200
+    if all(r['status'] in ('invalid', 'not_found') for r in results):
+        return jsonify({'status': 'error', 'results': results}), 400
+    return jsonify({'status': 'error', 'results': results}), 500
+
+# Header cells recognised in an uploaded roster CSV, English or as Excel users name them
+ROSTER_CSV_HEADERS = {
+    'student_id': {'student_id', '生徒ID', '生徒id', 'ID', 'id'},
+    'name': {'name', '名前', '氏名', '生徒名'},
+}
+
+def _parse_roster_upload():
+    """
+    Reads the students to import from a JSON body ([{student_id, name}] or
+    {'students': [...]}) or an uploaded CSV file ('file' field). The CSV may be
+    UTF-8 or Shift_JIS (Excel's default for Japanese) and may have a header row
+    (student_id,name or 生徒ID,名前); without one, columns are taken in that order.
+    Raises ValueError if the file can't be decoded.
+    """
+    upload = request.files.get('file')
+    if upload is None:
+        data = request.get_json(silent=True)
+        students = data.get('students') if isinstance(data, dict) else data
+        return students if isinstance(students, list) else None
+
+    raw = upload.read()
+    for encoding in ('utf-8-sig', 'cp932'):
+        try:
+            text = raw.decode(encoding)
+            break
+        except UnicodeDecodeError:
+            continue
+    else:
+        raise ValueError('CSV must be UTF-8 or Shift_JIS')
+
+    rows = [row for row in csv.reader(io.StringIO(text)) if any(cell.strip() for cell in row)]
+    columns = {}
+    if rows:
+        for index, cell in enumerate(rows[0]):
+            for field, names in ROSTER_CSV_HEADERS.items():
+                if cell.strip() in names:
+                    columns.setdefault(field, index)
+    if len(columns) == len(ROSTER_CSV_HEADERS):
+        return [{field: row[index] if index < len(row) else '' for field, index in columns.items()}
+                for row in rows[1:]]
+    return [{'student_id': row[0], 'name': row[1] if len(row) > 1 else ''} for row in rows]
+
+@app.route('/api/admin/import_students', methods=['POST'])
+def import_students():
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    try:
+        students = _parse_roster_upload()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not students:
+        return jsonify({'error': 'No students to import'}), 400
+    if len(students) > sheets_handler.MAX_IMPORT_STUDENTS:
+        return jsonify({'error': f'At most {sheets_handler.MAX_IMPORT_STUDENTS} students per import'}), 400
+
+    results = sheets_handler.create_students(students)
+    return _batch_response(results)
+
+@app.route('/api/admin/delete_students', methods=['POST'])
+def delete_students():
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    data = request.json
+    student_ids = data.get('student_ids') if isinstance(data, dict) else data
+    if not isinstance(student_ids, list) or not student_ids:
+        return jsonify({'error': 'Missing student_ids'}), 400
+
+    results = sheets_handler.delete_students([str(student_id) for student_id in student_ids])
+    return _batch_response(results)
+
 @app.route('/api/admin/reply_question', methods=['POST'])
 def reply_question():
     if not session.get('admin_logged_in'):
@@ -202,6 +430,96 @@ def reply_question():
     else:
         return jsonify({'error': 'Failed to submit reply'}), 500
 
+def _page_args():
+    page = request.args.get('page', 1, type=int)
+    size = request.args.get('size', 20, type=int)
+    return page, size
+
+@app.route('/api/admin/students', methods=['GET'])
+def list_students():
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    page, size = _page_args()
+    try:
+        result = sheets_handler.get_students_page(
+            page, size,
+            sort=request.args.get('sort', 'student_id'),
+            week=request.args.get('week') or None
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'status': 'success', **result}), 200
+
+@app.route('/api/admin/questions', methods=['GET'])
+def list_questions():
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    page, size = _page_args()
+    try:
+        result = sheets_handler.get_questions_page(
+            page, size,
+            sort=request.args.get('sort', 'timestamp'),
+            student_id=request.args.get('student_id') or None
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'status': 'success', **result}), 200
+
+# Upper bound on replies per batch request (one values.batchUpdate)
+MAX_BATCH_REPLIES = 200
+
+@app.route('/api/admin/reply_questions', methods=['POST'])
+def reply_questions():
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    data = request.json
+    replies = data.get('replies') if isinstance(data, dict) else data
+    if not isinstance(replies, list) or not replies:
+        return jsonify({'error': 'Missing replies'}), 400
+    if len(replies) > MAX_BATCH_REPLIES:
+        return jsonify({'error': f'At most {MAX_BATCH_REPLIES} replies per request'}), 400
+
+    results = sheets_handler.reply_to_questions(replies)
+    return _batch_response(results)
+
+# Seconds between SSE comments that keep idle connections (and proxies) open
+STREAM_HEARTBEAT_SECONDS = 20
+# How long a tab turned away at the stream limit polls before trying again
+STREAM_RETRY_SECONDS = 60
+
+@app.route('/api/admin/stream')
+def admin_stream():
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    events = live_updates.subscribe()
+    if events is None:
+        # Each stream holds a worker thread; past the limit the page polls instead
+        return jsonify({'error': 'Too many open streams'}), 503, {'Retry-After': str(STREAM_RETRY_SECONDS)}
+
+    def generate():
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    event = events.get(timeout=STREAM_HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                data = json.dumps(event['data'], ensure_ascii=False)
+                yield f"id: {event['id']}\nevent: {event['event']}\ndata: {data}\n\n"
+        finally:
+            # Runs when the client disconnects and the next write fails
+            live_updates.unsubscribe(events)
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 # --- Schedule APIs ---
 
 @app.route('/api/admin/schedules', methods=['GET'])
@@ -209,8 +527,12 @@ def get_schedules():
     if not session.get('admin_logged_in'):
         return jsonify({'error': 'Unauthorized'}), 401
     
+    not_modified = _not_modified(sheets_handler.peek_view_etag('schedules'))
+    if not_modified:
+        return not_modified
+
     schedules = sheets_handler.get_schedules()
-    return jsonify({'status': 'success', 'schedules': schedules}), 200
+    return _json_with_etag({'status': 'success', 'schedules': schedules}, sheets_handler.content_hash(schedules))
 
 @app.route('/api/admin/schedules', methods=['POST'])
 def add_schedule():
@@ -258,8 +580,30 @@ def get_dashboard_metrics():
     if not session.get('admin_logged_in'):
         return jsonify({'error': 'Unauthorized'}), 401
     
-    metrics = sheets_handler.get_dashboard_metrics()
-    return jsonify({'status': 'success', 'data': metrics}), 200
+    # The ETag covers the metrics only, not their age, hence weak
+    not_modified = _not_modified(sheets_handler.peek_dashboard_metrics_etag(), weak=True)
+    if not_modified:
+        return not_modified
+
+    snapshot = sheets_handler.get_dashboard_metrics_snapshot()
+    if snapshot is None:
+        return jsonify({'status': 'success', 'data': {}}), 200
+    return _json_with_etag({
+        'status': 'success',
+        'data': snapshot['metrics'],
+        'generated_at': datetime.fromtimestamp(snapshot['generated_at'], timezone.utc).isoformat(),
+        'age_seconds': round(time.time() - snapshot['generated_at'], 1)
+    }, snapshot['etag'], weak=True)
+
+@app.route('/api/admin/client_pool_stats', methods=['GET'])
+def get_client_pool_stats():
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    stats = sheets_handler.get_client_pool_stats()
+    stats['scheduler'] = sheets_handler.get_scheduler_stats()
+    stats['replica'] = sheets_handler.get_replica_stats()
+    return jsonify({'status': 'success', 'data': stats}), 200
 
 if __name__ == '__main__':
     app.run(debug=True, port=8081, host='0.0.0.0')
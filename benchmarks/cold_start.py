@@ -0,0 +1,99 @@
+"""
+Cold start of a worker, from `import app` to the first answered request,
+each run in a fresh interpreter:
+
+  import      import app (Flask, sheets_handler, live_updates)
+  client      first get_service() and the first request built on it:
+              Google library imports, discovery document parse, client and
+              spreadsheets().values() resource construction
+  request     first GET /api/progress: roster load and student tab read
+              against the in-memory emulator, plus Flask's first request
+
+It also reports the cost of building one Sheets request
+(service.spreadsheets().values().batchGet(...)) on a warm client, for
+sheets_handler's client and for a stock build('sheets', 'v4') client.
+
+    python benchmarks/cold_start.py --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_CHILD = r'''
+import json, sys, time
+sys.path[:0] = [ROOT, ROOT + '/benchmarks']
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+
+import sheets_handler
+from sheets_emulator import SheetsEmulator, _StaticCredentials
+sheets_handler._CREDENTIALS = _StaticCredentials()
+setup = time.perf_counter()
+service = sheets_handler.get_service()
+service.spreadsheets().values().batchGet(spreadsheetId='x', ranges=['A1'])
+client_built = time.perf_counter()
+
+emulator = SheetsEmulator()
+student_id = emulator.seed_cohort(20)[0]
+emulator.install()
+client = app.app.test_client()
+with client.session_transaction() as session:
+    session['student_id'] = student_id
+ready = time.perf_counter()
+response = client.get('/api/progress')
+answered = time.perf_counter()
+assert response.status_code == 200, response.status_code
+
+
+def per_request(service, n=50):
+    service.spreadsheets().values().batchGet(spreadsheetId='x', ranges=['A1'])
+    t = time.perf_counter()
+    for _ in range(n):
+        service.spreadsheets().values().batchGet(spreadsheetId='x', ranges=['A1'])
+    return (time.perf_counter() - t) / n
+
+
+import httplib2
+from googleapiclient.discovery import build
+stock = build('sheets', 'v4', http=httplib2.Http(), cache_discovery=False)
+print(json.dumps({
+    'import': imported - started,
+    'client': client_built - setup,
+    'request': answered - ready,
+    'total': (imported - started) + (client_built - setup) + (answered - ready),
+    'build_request': per_request(service),
+    'build_request_stock': per_request(stock, 10),
+}))
+'''
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    env = dict(os.environ, SHEETS_WARMUP='', SHEETS_REPLICA_PATH='')
+    samples = []
+    for _ in range(args.runs):
+        out = subprocess.run(
+            [sys.executable, '-c', _CHILD.replace('ROOT', repr(ROOT))],
+            cwd=ROOT, env=env, capture_output=True, text=True, check=True
+        ).stdout
+        samples.append(json.loads(out.strip().splitlines()[-1]))
+
+    print(f"median of {args.runs} fresh interpreters")
+    for key, label in [('import', 'import app'), ('client', 'first client'), ('request', 'first request'),
+                       ('total', 'import to first response'), ('build_request', 'build one request'),
+                       ('build_request_stock', 'build one request (stock client)')]:
+        values = [s[key] * 1000 for s in samples]
+        print(f"  {label:<34}{statistics.median(values):>9.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,266 @@
+"""
+Latency, throughput and Sheets calls per request of the main endpoints,
+offline against the in-memory Sheets emulator.
+
+Each cohort size runs in a fresh interpreter that seeds the emulator, points
+sheets_handler at it and sends every scenario through Flask's test client:
+
+  login               POST /login
+  progress_get        GET  /api/progress
+  progress_post       POST /api/progress (one task status)
+  admin               GET  /admin
+  dashboard_metrics   GET  /api/admin/dashboard_metrics
+  schedules_get       GET  /api/admin/schedules
+  schedules_post      POST /api/admin/schedules
+  schedules_delete    DELETE /api/admin/schedules
+
+Scenarios run in this order in one process, so later ones find the caches
+earlier ones filled, like a worker that has been up for a while. Student
+scenarios cycle through the cohort: with more students than requests every
+read is a cold one. Sheets calls per request are taken from each response's
+Server-Timing header, so background refreshes are not counted against it.
+
+    python benchmarks/endpoints.py --students 10 100 1000 --latency 0.05
+    python benchmarks/endpoints.py --save benchmarks/baseline.json
+    python benchmarks/endpoints.py --check benchmarks/baseline.json
+
+--check exits with status 1 when a scenario makes more Sheets calls per
+request than the baseline, or its p95 latency grows past --max-slowdown
+times the baseline's. Calls per request are exact with --concurrency 1;
+latency is only compared above --min-p95-ms, where timer noise is small.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = [
+    'login', 'progress_get', 'progress_post', 'admin', 'dashboard_metrics',
+    'schedules_get', 'schedules_post', 'schedules_delete',
+]
+_SHEETS_TIMING = re.compile(r'(?:^|, )sheets;dur=[\d.]+;desc="(\d+) calls')
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def _sheets_calls(response):
+    match = _SHEETS_TIMING.search(response.headers.get('Server-Timing', ''))
+    return int(match.group(1)) if match else 0
+
+
+# --- Child: one cohort in this interpreter ---
+
+def _requests_for(scenario, students, count, sheets_handler, client_for):
+    """
+    Returns [(client, method, path, kwargs, expected status)] for a scenario.
+    Anything a request needs (sessions, schedule IDs) is prepared here, outside the timings.
+    """
+    first_task = sheets_handler.TASKS_FIRST_ROW
+    plan = []
+    if scenario == 'schedules_delete':
+        admin = client_for('admin')
+        ids = [s['id'] for s in admin.get('/api/admin/schedules').get_json()['schedules']]
+        count = min(count, len(ids))
+    for i in range(count):
+        student_id = students[i % len(students)]
+        if scenario == 'login':
+            plan.append((client_for(None), 'post', '/login', {'data': {'student_id': student_id}}, 302))
+        elif scenario == 'progress_get':
+            plan.append((client_for(student_id), 'get', '/api/progress', {}, 200))
+        elif scenario == 'progress_post':
+            body = {'task_id': first_task + i % 20, 'status': '完了'}
+            plan.append((client_for(student_id), 'post', '/api/progress', {'json': body}, 200))
+        elif scenario == 'admin':
+            plan.append((client_for('admin'), 'get', '/admin', {}, 200))
+        elif scenario == 'dashboard_metrics':
+            plan.append((client_for('admin'), 'get', '/api/admin/dashboard_metrics', {}, 200))
+        elif scenario == 'schedules_get':
+            plan.append((client_for('admin'), 'get', '/api/admin/schedules', {}, 200))
+        elif scenario == 'schedules_post':
+            body = {'title': f"面談 {i}", 'start': f"2025-07-{1 + i % 28:02d}"}
+            plan.append((client_for('admin'), 'post', '/api/admin/schedules', {'json': body}, 200))
+        elif scenario == 'schedules_delete':
+            plan.append((client_for('admin'), 'delete', '/api/admin/schedules', {'json': {'id': ids[i]}}, 200))
+    return plan
+
+
+def _run_scenario(plan, concurrency):
+    # Returns (wall seconds, [(seconds, sheets calls, ok)])
+    results = [None] * len(plan)
+    cursor = iter(range(len(plan)))
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                i = next(cursor, None)
+            if i is None:
+                return
+            client, method, path, kwargs, expected = plan[i]
+            started = time.perf_counter()
+            response = getattr(client, method)(path, **kwargs)
+            elapsed = time.perf_counter() - started
+            results[i] = (elapsed, _sheets_calls(response), response.status_code == expected)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - started, results
+
+
+def run_cohort(n_students, requests, latency, concurrency):
+    sys.path[:0] = [ROOT, os.path.join(ROOT, 'benchmarks')]
+    import app
+    import sheets_handler
+    from sheets_emulator import SheetsEmulator
+
+    emulator = SheetsEmulator(latency=latency, seed=1)
+    students = emulator.seed_cohort(n_students)
+    emulator.install()
+
+    def client_for(user):
+        # A client per request keeps sessions apart when threads share the plan
+        client = app.app.test_client()
+        if user is not None:
+            with client.session_transaction() as session:
+                if user == 'admin':
+                    session['admin_logged_in'] = True
+                else:
+                    session['student_id'] = user
+        return client
+
+    report = {}
+    for scenario in SCENARIOS:
+        plan = _requests_for(scenario, students, requests, sheets_handler, client_for)
+        emulator.reset_calls()
+        wall, results = _run_scenario(plan, concurrency)
+        latencies = [r[0] * 1000 for r in results]
+        report[scenario] = {
+            'requests': len(results),
+            'p50_ms': round(statistics.median(latencies), 2) if latencies else 0.0,
+            'p95_ms': round(_percentile(latencies, 95), 2),
+            'rps': round(len(results) / wall, 1) if wall else 0.0,
+            'calls_per_request': round(sum(r[1] for r in results) / max(len(results), 1), 3),
+            'errors': sum(1 for r in results if not r[2]),
+            # Includes background refreshes started by the scenario
+            'emulator_calls': emulator.total_calls(),
+        }
+    return report
+
+
+# --- Parent: one child per cohort, reporting and regression check ---
+
+def _run_child(n_students, args):
+    env = dict(
+        os.environ,
+        SHEETS_WARMUP='',
+        SHEETS_REPLICA_PATH='',
+        # Measure the app, not the quota buckets
+        SHEETS_READ_QUOTA_PER_MINUTE='1000000',
+        SHEETS_WRITE_QUOTA_PER_MINUTE='1000000',
+        SLOW_REQUEST_SECONDS='1e9',
+        SERVER_TIMING_ENABLED='1',
+    )
+    command = [sys.executable, os.path.abspath(__file__), '--child', str(n_students),
+               '--requests', str(args.requests), '--latency', str(args.latency),
+               '--concurrency', str(args.concurrency)]
+    out = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True)
+    if out.returncode != 0:
+        sys.stderr.write(out.stderr)
+        raise SystemExit(f"Benchmark for {n_students} students failed")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def _print_report(results, args):
+    print(f"{args.requests} requests per scenario, {args.latency * 1000:.0f} ms per Sheets call, "
+          f"{args.concurrency} client(s)")
+    print(f"{'students':>8}  {'scenario':<18}{'p50 ms':>9}{'p95 ms':>9}{'req/s':>9}{'calls/req':>11}{'errors':>8}")
+    for students, report in results.items():
+        for scenario, r in report.items():
+            print(f"{students:>8}  {scenario:<18}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['rps']:>9.1f}"
+                  f"{r['calls_per_request']:>11.2f}{r['errors']:>8}")
+
+
+def check_regressions(results, baseline, max_slowdown, min_p95_ms):
+    """
+    Returns a list of regression messages; empty if results hold up against the baseline.
+    """
+    problems = []
+    for students, report in results.items():
+        for scenario, r in report.items():
+            base = baseline.get('results', {}).get(students, {}).get(scenario)
+            if base is None:
+                continue
+            label = f"{scenario} @ {students} students"
+            if r['errors'] > base['errors']:
+                problems.append(f"{label}: {r['errors']} errors (baseline {base['errors']})")
+            if r['calls_per_request'] > base['calls_per_request'] + 0.001:
+                problems.append(f"{label}: {r['calls_per_request']} Sheets calls/request "
+                                f"(baseline {base['calls_per_request']})")
+            if base['p95_ms'] >= min_p95_ms and r['p95_ms'] > base['p95_ms'] * max_slowdown:
+                problems.append(f"{label}: p95 {r['p95_ms']} ms (baseline {base['p95_ms']} ms)")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--students', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--requests', type=int, default=50, help='requests per scenario')
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds per emulated Sheets call')
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--save', metavar='PATH', help='write the results as a baseline')
+    parser.add_argument('--check', metavar='PATH', help='compare against a saved baseline')
+    parser.add_argument('--max-slowdown', type=float, default=2.0)
+    parser.add_argument('--min-p95-ms', type=float, default=20.0)
+    parser.add_argument('--child', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        print(json.dumps(run_cohort(args.child, args.requests, args.latency, args.concurrency)))
+        return
+
+    results = {str(n): _run_child(n, args) for n in args.students}
+    _print_report(results, args)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({
+                'requests': args.requests, 'latency': args.latency, 'concurrency': args.concurrency,
+                'results': results,
+            }, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+        print(f"Saved baseline to {args.save}")
+
+    if args.check:
+        with open(args.check, encoding='utf-8') as f:
+            baseline = json.load(f)
+        settings = {'requests': args.requests, 'latency': args.latency, 'concurrency': args.concurrency}
+        recorded = {key: baseline.get(key) for key in settings}
+        if recorded != settings:
+            sys.exit(f"{args.check} was recorded with {recorded}, not {settings}")
+        problems = check_regressions(results, baseline, args.max_slowdown, args.min_p95_ms)
+        for problem in problems:
+            print(f"REGRESSION {problem}")
+        if problems:
+            sys.exit(1)
+        print(f"No regressions against {args.check}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,362 @@
+"""
+Load test modelling a cohort deadline spike: the hour before 課題提出, when
+students log in, reload their dashboards and flip task statuses while mentors
+answer questions.
+
+The app runs under gunicorn (benchmarks/loadtest_gunicorn.conf.py: one Sheets
+emulator per worker) for every --workers x --threads combination. Against
+each, the number of concurrent students is stepped up through --users until
+the server saturates. Every virtual user loops through a scripted journey,
+with random think time between actions:
+
+  student   POST /login -> GET /dashboard -> GET /api/progress, then a few
+            rounds of POST /api/progress (1-3 task statuses) and a dashboard
+            reload (GET /api/progress with If-None-Match), and now and then
+            POST /api/question
+  mentor    POST /admin/login, then GET /api/admin/questions ->
+            POST /api/admin/reply_question for the oldest open question,
+            and GET /admin; all the while with GET /api/admin/stream open,
+            as the dashboard keeps it. When the server turns the stream away
+            (503), the mentor polls the question and student lists every
+            --poll-seconds and tries again, like the dashboard's fallback
+
+A step is saturated when its p95 exceeds --slo-ms, more than 1% of requests
+fail, or throughput grows less than 10% over the previous step. The saturation
+point of a configuration is the last step before that one.
+
+    python benchmarks/loadtest.py --workers 1 2 4 --threads 1 8 --users 10 20 40 80 160
+
+Sheets quotas are raised out of the way by default; pass --quota-per-minute 60
+to see the production buckets (the quota split between the workers) take over.
+
+Needs httpx (pip install httpx), which the app itself does not use.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GUNICORN_CONF = os.path.join(ROOT, 'benchmarks', 'loadtest_gunicorn.conf.py')
+
+TASK_STATUSES = ['未着手', '進行中', '完了']
+# Generous, so a saturated server shows up as latency rather than client errors
+REQUEST_TIMEOUT = 60.0
+# Step is saturated when throughput grows less than this over the previous one
+MIN_THROUGHPUT_GAIN = 1.10
+MAX_ERROR_RATE = 0.01
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))]
+
+
+# --- Journeys ---
+
+class _Journey:
+    def __init__(self, base_url, samples, stop_at, think_time, seed):
+        self.base_url = base_url
+        self.samples = samples
+        self.stop_at = stop_at
+        self.think_time = think_time
+        self.rng = random.Random(seed)
+
+    def running(self):
+        return time.monotonic() < self.stop_at
+
+    async def think(self):
+        await asyncio.sleep(self.rng.uniform(0, 2 * self.think_time))
+
+    async def call(self, client, name, method, path, expected=(200,), **kwargs):
+        # Records (finished at, name, seconds, ok); returns the response or None
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, path, **kwargs)
+            ok = response.status_code in expected
+        except httpx.HTTPError:
+            response, ok = None, False
+        self.samples.append((time.monotonic(), name, time.perf_counter() - started, ok))
+        return response
+
+
+class _Student(_Journey):
+    def __init__(self, student_id, *args):
+        super().__init__(*args)
+        self.student_id = student_id
+
+    async def run(self):
+        async with httpx.AsyncClient(base_url=self.base_url, timeout=REQUEST_TIMEOUT) as client:
+            while self.running():
+                await self.call(client, 'login', 'POST', '/login', expected=(302,),
+                                data={'student_id': self.student_id})
+                await self.call(client, 'dashboard', 'GET', '/dashboard')
+                response = await self.call(client, 'progress_get', 'GET', '/api/progress')
+                if response is None or response.status_code != 200:
+                    await self.think()
+                    continue
+                tasks = response.json().get('tasks', [])
+                etag = response.headers.get('etag')
+
+                for _ in range(self.rng.randint(2, 5)):
+                    await self.think()
+                    if not self.running() or not tasks:
+                        break
+                    picked = self.rng.sample(tasks, min(len(tasks), self.rng.randint(1, 3)))
+                    updates = [{'task_id': t['id'], 'status': self.rng.choice(TASK_STATUSES)} for t in picked]
+                    await self.call(client, 'progress_post', 'POST', '/api/progress', json=updates)
+                    headers = {'If-None-Match': etag} if etag else {}
+                    response = await self.call(client, 'progress_reload', 'GET', '/api/progress',
+                                               expected=(200, 304), headers=headers)
+                    if response is not None and response.status_code == 200:
+                        etag = response.headers.get('etag')
+
+                if self.running() and self.rng.random() < 0.3:
+                    await self.call(client, 'question_post', 'POST', '/api/question',
+                                    json={'question': f"{self.student_id} の課題について質問です"})
+                await self.think()
+
+
+class _Mentor(_Journey):
+    def __init__(self, password, poll_seconds, *args):
+        super().__init__(*args)
+        self.password = password
+        self.poll_seconds = poll_seconds
+
+    async def run(self):
+        async with httpx.AsyncClient(base_url=self.base_url, timeout=REQUEST_TIMEOUT) as client:
+            await self.call(client, 'admin_login', 'POST', '/admin/login', expected=(302,),
+                            data={'password': self.password})
+            watcher = asyncio.create_task(self.watch(client))
+            try:
+                await self.answer_questions(client)
+            finally:
+                watcher.cancel()
+                await asyncio.gather(watcher, return_exceptions=True)
+
+    async def watch(self, client):
+        # stream_open is the time to the response headers; a 503 is the server's
+        # stream limit at work, not a failure
+        while self.running():
+            started = time.perf_counter()
+            try:
+                async with client.stream('GET', '/api/admin/stream') as response:
+                    self.samples.append((time.monotonic(), 'stream_open', time.perf_counter() - started,
+                                         response.status_code in (200, 503)))
+                    if response.status_code == 200:
+                        # Held open until the step ends and run() cancels it
+                        async for _ in response.aiter_lines():
+                            pass
+                        continue
+            except httpx.HTTPError:
+                self.samples.append((time.monotonic(), 'stream_open', time.perf_counter() - started, False))
+            await asyncio.sleep(self.poll_seconds)
+            if self.running():
+                await self.call(client, 'poll_questions', 'GET', '/api/admin/questions?size=20')
+                await self.call(client, 'poll_students', 'GET', '/api/admin/students?size=20')
+
+    async def answer_questions(self, client):
+        while self.running():
+            response = await self.call(client, 'questions_get', 'GET', '/api/admin/questions?size=20')
+            questions = []
+            if response is not None and response.status_code == 200:
+                questions = response.json().get('questions', [])
+            if questions:
+                await self.think()
+                await self.call(client, 'reply_post', 'POST', '/api/admin/reply_question',
+                                json={'row_index': questions[0]['row_index'], 'reply_text': '確認しました'})
+            await self.think()
+            await self.call(client, 'admin_page', 'GET', '/admin')
+            await self.think()
+
+
+async def run_step(base_url, users, args):
+    """
+    Runs `users` students and --mentors mentors for --duration seconds.
+    Returns the samples that finished between the end of --ramp-up and the end of the step.
+    """
+    samples = []
+    started = time.monotonic()
+    stop_at = started + args.duration
+
+    async def staggered(journey):
+        # Everyone arrives within the ramp-up window, like a deadline rush
+        await asyncio.sleep(journey.rng.uniform(0, args.ramp_up))
+        await journey.run()
+
+    journeys = [
+        _Student(f"student_{1 + i % args.students:04d}", base_url, samples, stop_at, args.think_time, i)
+        for i in range(users)
+    ]
+    journeys += [
+        _Mentor(args.admin_password, args.poll_seconds, base_url, samples, stop_at, args.think_time, -1 - i)
+        for i in range(args.mentors)
+    ]
+    await asyncio.gather(*(staggered(j) for j in journeys))
+    return [s for s in samples if started + args.ramp_up <= s[0] <= stop_at]
+
+
+def summarize(samples, window):
+    latencies = [s[2] * 1000 for s in samples]
+    errors = sum(1 for s in samples if not s[3])
+    return {
+        'requests': len(samples),
+        'rps': len(samples) / window if window > 0 else 0.0,
+        'p50_ms': statistics.median(latencies) if latencies else 0.0,
+        'p95_ms': _percentile(latencies, 95),
+        'p99_ms': _percentile(latencies, 99),
+        'error_rate': errors / len(samples) if samples else 0.0,
+    }
+
+
+def _by_request(samples):
+    names = sorted({s[1] for s in samples})
+    return {name: _percentile([s[2] * 1000 for s in samples if s[1] == name], 95) for name in names}
+
+
+# --- gunicorn ---
+
+def start_server(workers, threads, args, log):
+    env = dict(
+        os.environ,
+        LOADTEST_STUDENTS=str(args.students),
+        LOADTEST_LATENCY=str(args.latency),
+        LOADTEST_JITTER=str(args.jitter),
+        ADMIN_PASSWORD=args.admin_password,
+        SHEETS_WARMUP='1',
+        # Keep the load-test students out of the real warm-up list
+        RECENT_STUDENTS_PATH=os.path.join(tempfile.gettempdir(), 'loadtest_recent_students.json'),
+        SHEETS_REPLICA_PATH='',
+        SHEETS_READ_QUOTA_PER_MINUTE=str(args.quota_per_minute),
+        SHEETS_WRITE_QUOTA_PER_MINUTE=str(args.quota_per_minute),
+        SLOW_REQUEST_SECONDS='1e9',
+    )
+    command = [
+        sys.executable, '-m', 'gunicorn', 'app:app', '-c', GUNICORN_CONF,
+        '--workers', str(workers), '--threads', str(threads),
+        '--bind', f"127.0.0.1:{args.port}", '--log-level', 'warning',
+    ]
+    server = subprocess.Popen(command, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            break
+        try:
+            # Only the worker that answers is known to be warm; good enough to start ramping
+            if httpx.get(f"{base_url}/healthz", timeout=2).status_code == 200:
+                return server, base_url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    stop_server(server)
+    raise RuntimeError(f"gunicorn with {workers} worker(s) x {threads} thread(s) did not become ready")
+
+
+def stop_server(server):
+    server.terminate()
+    try:
+        server.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        server.kill()
+        server.wait()
+
+
+def run_configuration(workers, threads, args, log):
+    """
+    Steps through --users against one gunicorn configuration. Returns
+    (rows, index of the saturation point or None, whether a step saturated).
+    """
+    server, base_url = start_server(workers, threads, args, log)
+    window = args.duration - args.ramp_up
+    rows = []
+    saturation = None
+    saturated = False
+    try:
+        for users in args.users:
+            samples = asyncio.run(run_step(base_url, users, args))
+            row = dict(summarize(samples, window), users=users, by_request=_by_request(samples))
+            previous = rows[-1] if rows else None
+            row['saturated'] = (
+                row['p95_ms'] > args.slo_ms
+                or row['error_rate'] > MAX_ERROR_RATE
+                or (previous is not None and row['rps'] < previous['rps'] * MIN_THROUGHPUT_GAIN)
+            )
+            rows.append(row)
+            print(f"  {users:>6} users  {row['rps']:>8.1f} req/s  p50 {row['p50_ms']:>7.1f}  "
+                  f"p95 {row['p95_ms']:>7.1f}  p99 {row['p99_ms']:>7.1f} ms  "
+                  f"errors {row['error_rate'] * 100:>5.1f}%" + ('  saturated' if row['saturated'] else ''),
+                  flush=True)
+            if row['saturated']:
+                saturated = True
+                saturation = len(rows) - 2 if len(rows) > 1 else None
+                slowest = sorted(row['by_request'].items(), key=lambda kv: -kv[1])[:4]
+                print('         slowest p95: ' + ', '.join(f"{name} {ms:.0f} ms" for name, ms in slowest))
+                break
+        else:
+            saturation = len(rows) - 1
+    finally:
+        stop_server(server)
+    return rows, saturation, saturated
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2])
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 8])
+    parser.add_argument('--users', type=int, nargs='+', default=[10, 20, 40, 80, 160],
+                        help='concurrent students per step')
+    parser.add_argument('--mentors', type=int, default=2)
+    parser.add_argument('--students', type=int, default=60, help='cohort size seeded in the emulator')
+    parser.add_argument('--latency', type=float, default=0.15, help='seconds per emulated Sheets call')
+    parser.add_argument('--jitter', type=float, default=0.1)
+    parser.add_argument('--poll-seconds', type=float, default=10.0,
+                        help='mentor polling interval without a stream (the dashboard uses 60)')
+    parser.add_argument('--think-time', type=float, default=1.0, help='mean seconds between actions')
+    parser.add_argument('--duration', type=float, default=20.0, help='seconds per step')
+    parser.add_argument('--ramp-up', type=float, default=5.0, help='seconds excluded at the start of a step')
+    parser.add_argument('--slo-ms', type=float, default=1000.0, help='p95 above this saturates a step')
+    parser.add_argument('--quota-per-minute', type=int, default=1000000)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--admin-password', default='loadtest')
+    parser.add_argument('--server-log', help='write gunicorn output here (default: a temp file)')
+    args = parser.parse_args()
+    if args.ramp_up >= args.duration:
+        parser.error('--ramp-up must be shorter than --duration')
+
+    log_path = args.server_log or os.path.join(tempfile.gettempdir(), 'loadtest_gunicorn.log')
+    print(f"{args.students} students, {args.mentors} mentors, {args.latency * 1000:.0f}"
+          f"+{args.jitter * 1000:.0f} ms per Sheets call, {args.duration:.0f} s steps; gunicorn log: {log_path}")
+
+    summary = []
+    with open(log_path, 'w') as log:
+        for workers in args.workers:
+            for threads in args.threads:
+                print(f"\n{workers} worker(s) x {threads} thread(s)", flush=True)
+                rows, saturation, saturated = run_configuration(workers, threads, args, log)
+                summary.append((workers, threads, rows[saturation] if saturation is not None else None, saturated))
+
+    print(f"\nSaturation points (last step with p95 <= {args.slo_ms:.0f} ms, "
+          f"<= {MAX_ERROR_RATE * 100:.0f}% errors and growing throughput)")
+    print(f"{'workers':>8}{'threads':>9}{'users':>8}{'req/s':>9}{'p95 ms':>9}")
+    for workers, threads, row, saturated in summary:
+        if row is None:
+            print(f"{workers:>8}{threads:>9}{'-':>8}{'-':>9}{'-':>9}   saturated at the first step")
+        else:
+            users = str(row['users']) if saturated else f"{row['users']}+"
+            print(f"{workers:>8}{threads:>9}{users:>8}{row['rps']:>9.1f}{row['p95_ms']:>9.1f}"
+                  + ('' if saturated else '   not saturated; add larger --users steps'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+"""
+gunicorn settings for benchmarks/loadtest.py: the production settings, with
+every worker talking to its own in-memory Sheets emulator instead of Google.
+
+    LOADTEST_STUDENTS   cohort size to seed (default 60)
+    LOADTEST_LATENCY    seconds per emulated Sheets call (default 0.15)
+    LOADTEST_JITTER     extra uniform random latency (default 0.1)
+
+Workers are seeded identically, but a write only lands in the emulator of
+the worker that served it.
+"""
+import os
+import runpy
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'benchmarks')]
+
+_production = runpy.run_path(os.path.join(ROOT, 'gunicorn.conf.py'))
+
+
+def post_fork(server, worker):
+    # Runs before the worker imports app, so every Sheets call it makes,
+    # warm-up included, goes to the emulator
+    from sheets_emulator import SheetsEmulator
+
+    emulator = SheetsEmulator(
+        latency=float(os.environ.get('LOADTEST_LATENCY', '0.15')),
+        jitter=float(os.environ.get('LOADTEST_JITTER', '0.1')),
+        seed=1
+    )
+    emulator.seed_cohort(int(os.environ.get('LOADTEST_STUDENTS', '60')))
+    emulator.install()
+    _production['post_fork'](server, worker)
@@ -0,0 +1,581 @@
+"""
+In-process stand-in for the Google Sheets v4 API.
+
+Implements the subset of the API that sheets_handler uses (values get /
+batchGet / update / batchUpdate / append, spreadsheets get / batchUpdate and
+sheets copyTo) against in-memory grids, with configurable per-call latency.
+Used by the benchmark and load-test scripts so they can run offline.
+
+    emulator = SheetsEmulator(latency=0.05)
+    emulator.seed_cohort(100)
+    emulator.install()          # sheets_handler now talks to the emulator
+"""
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from urllib.parse import quote, urlencode
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+DEFAULT_SPREADSHEET_ID = '1BtolneaNSnEbJlPGwwDm2WL6gJ86sUNtmj7AszT9v7U'
+_API_ROOT = 'https://sheets.googleapis.com/v4/spreadsheets'
+CIRCLED_NUMBERS = "①②③④⑤⑥⑦⑧⑨⑩⑪⑫⑬⑭⑮⑯⑰⑱⑲⑳"
+TASK_STATUSES = ['未着手', '進行中', '完了']
+
+_CELL_RE = re.compile(r'^([A-Z]*)(\d*)$')
+_HYPERLINK_RE = re.compile(r'^=HYPERLINK\("[^"]*",\s*"([^"]*)"\)$', re.IGNORECASE)
+
+
+def _col_to_index(col):
+    index = 0
+    for ch in col:
+        index = index * 26 + (ord(ch) - ord('A') + 1)
+    return index - 1
+
+
+def _index_to_col(index):
+    col = ''
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        col = chr(ord('A') + rem) + col
+    return col
+
+
+def quote_sheet_name(title):
+    return "'" + title.replace("'", "''") + "'"
+
+
+def parse_a1(range_name):
+    """
+    Splits an A1 range into (sheet_title, start_row, start_col, end_row, end_col).
+    Rows/cols are 0-based; open ends are None.
+    """
+    if '!' in range_name:
+        sheet_part, cells = range_name.rsplit('!', 1)
+    else:
+        sheet_part, cells = range_name, ''
+    if sheet_part.startswith("'") and sheet_part.endswith("'"):
+        sheet_part = sheet_part[1:-1].replace("''", "'")
+
+    if not cells:
+        return sheet_part, 0, 0, None, None
+
+    start, _, end = cells.partition(':')
+    start_match = _CELL_RE.match(start.upper())
+    if not start_match:
+        raise ValueError(f"Unable to parse range: {range_name}")
+    start_col = _col_to_index(start_match.group(1)) if start_match.group(1) else 0
+    start_row = int(start_match.group(2)) - 1 if start_match.group(2) else 0
+
+    if not end:
+        # Single cell ('D5') or whole column/row ('A')
+        end_col = start_col if start_match.group(1) else None
+        end_row = start_row if start_match.group(2) else None
+        return sheet_part, start_row, start_col, end_row, end_col
+
+    end_match = _CELL_RE.match(end.upper())
+    if not end_match:
+        raise ValueError(f"Unable to parse range: {range_name}")
+    end_col = _col_to_index(end_match.group(1)) if end_match.group(1) else None
+    end_row = int(end_match.group(2)) - 1 if end_match.group(2) else None
+    return sheet_part, start_row, start_col, end_row, end_col
+
+
+def _http_error(status, message):
+    resp = httplib2.Response({'status': status})
+    resp.reason = message
+    content = json.dumps({'error': {'code': status, 'message': message}}).encode()
+    return HttpError(resp, content)
+
+
+class _Sheet:
+    def __init__(self, sheet_id, title, index, rows=None, row_count=1000, column_count=26):
+        self.sheet_id = sheet_id
+        self.title = title
+        self.index = index
+        self.rows = [list(r) for r in (rows or [])]
+        self.row_count = max(row_count, len(self.rows))
+        self.column_count = column_count
+
+    def properties(self):
+        return {
+            'sheetId': self.sheet_id,
+            'title': self.title,
+            'index': self.index,
+            'sheetType': 'GRID',
+            'gridProperties': {'rowCount': self.row_count, 'columnCount': self.column_count},
+        }
+
+
+class SheetsEmulator:
+    """
+    Thread-safe in-memory spreadsheet store plus a googleapiclient-compatible
+    service object (see service()).
+
+    latency     seconds slept per executed call (float, or callable(method) -> float)
+    jitter      extra uniform random latency in [0, jitter)
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self._lock = threading.RLock()
+        self._spreadsheets = {}
+        self._next_sheet_id = 1000
+        self._failures = []
+        self.calls = Counter()
+        self.call_log = []
+        self.log_calls = False
+
+    # --- Store management ---
+
+    def add_spreadsheet(self, spreadsheet_id=DEFAULT_SPREADSHEET_ID):
+        with self._lock:
+            return self._spreadsheets.setdefault(spreadsheet_id, {})
+
+    def add_sheet(self, title, rows=None, spreadsheet_id=DEFAULT_SPREADSHEET_ID, sheet_id=None):
+        with self._lock:
+            sheets = self.add_spreadsheet(spreadsheet_id)
+            if sheet_id is None:
+                sheet_id = self._allocate_sheet_id()
+            sheet = _Sheet(sheet_id, title, len(sheets), rows)
+            sheets[title] = sheet
+            return sheet
+
+    def sheet_rows(self, title, spreadsheet_id=DEFAULT_SPREADSHEET_ID):
+        with self._lock:
+            return [list(r) for r in self._spreadsheets[spreadsheet_id][title].rows]
+
+    def sheet_titles(self, spreadsheet_id=DEFAULT_SPREADSHEET_ID):
+        with self._lock:
+            return list(self._spreadsheets[spreadsheet_id].keys())
+
+    def _allocate_sheet_id(self):
+        self._next_sheet_id += 1
+        return self._next_sheet_id
+
+    def seed_cohort(self, n_students, weeks=4, tasks_per_week=5, questions=None,
+                    spreadsheet_id=DEFAULT_SPREADSHEET_ID):
+        """
+        Builds a Master roster with n_students student tabs plus the shared
+        質問 / Schedules / Sales tabs, shaped like the production spreadsheet.
+        """
+        rng = self._random
+        template = self._student_tab_rows(weeks, tasks_per_week, rng, fill_status=False)
+        self.add_sheet('Master', [['Student ID', 'Spreadsheet ID', 'Name', 'Sheet Name']],
+                       spreadsheet_id)
+        self.add_sheet('行動管理③', template, spreadsheet_id)
+
+        master_rows = []
+        for i in range(1, n_students + 1):
+            tab = f"行動管理{CIRCLED_NUMBERS[i - 1]}" if i <= 20 else f"行動管理{i}"
+            if tab == '行動管理③':
+                tab = '行動管理③_生徒'
+            student_id = f"student_{i:04d}"
+            self.add_sheet(tab, self._student_tab_rows(weeks, tasks_per_week, rng), spreadsheet_id)
+            master_rows.append([student_id, spreadsheet_id, f"生徒 {i}", tab])
+        self._spreadsheets[spreadsheet_id]['Master'].rows.extend(master_rows)
+
+        if questions is None:
+            questions = n_students
+        question_rows = [['Timestamp', 'StudentID', 'Question', 'Status', 'Reply']]
+        for q in range(questions):
+            answered = rng.random() < 0.7
+            question_rows.append([
+                f"2025-05-{1 + q % 28:02d} 10:00:00",
+                f"student_{1 + q % max(n_students, 1):04d}",
+                f"質問 {q + 1}",
+                '回答済み' if answered else '未回答',
+                '回答です' if answered else '',
+            ])
+        self.add_sheet('質問', question_rows, spreadsheet_id)
+
+        schedule_rows = [['ID', 'Title', 'Start', 'End', 'Type']]
+        for d in range(10):
+            schedule_rows.append([f"event-{d}", f"面談 {d + 1}", f"2025-06-{d + 1:02d}", '', 'event'])
+        self.add_sheet('Schedules', schedule_rows, spreadsheet_id)
+
+        sales_rows = [['Month', 'Revenue', 'Target']]
+        for m in range(1, 7):
+            sales_rows.append([f"2025-{m:02d}", str(500000 + m * 20000), str(600000 + m * 10000)])
+        self.add_sheet('Sales', sales_rows, spreadsheet_id)
+        return [row[0] for row in master_rows]
+
+    @staticmethod
+    def _student_tab_rows(weeks, tasks_per_week, rng, fill_status=True):
+        current_week = rng.randint(1, weeks) if fill_status else ''
+        rows = [
+            ['今月の目標', '', 'ボトルネック', '', '', ''],
+            ['フォロワー1万人' if fill_status else '', '', '時間不足' if fill_status else '', '', '', ''],
+            ['今週のフォーカス', '', '', '現在のWeek', 'メンター', ''],
+            ['投稿を毎日' if fill_status else '', '', '',
+             f"Week {current_week}" if fill_status else '', 'メンターA' if fill_status else '', ''],
+            ['', '', '', '', '', ''],
+        ]
+        for w in range(1, weeks + 1):
+            for t in range(tasks_per_week):
+                status = rng.choice(TASK_STATUSES) if fill_status else '未着手'
+                rows.append([f"Week {w}" if t == 0 else '', f"課題 {w}-{t + 1}", f"説明 {w}-{t + 1}", status])
+        return rows
+
+    # --- Fault injection / accounting ---
+
+    def fail_next(self, count=1, status=429, methods=None):
+        """Makes the next `count` matching calls raise HttpError(status)."""
+        with self._lock:
+            for _ in range(count):
+                self._failures.append((status, set(methods) if methods else None))
+
+    def reset_calls(self):
+        with self._lock:
+            self.calls.clear()
+            self.call_log = []
+
+    def total_calls(self):
+        with self._lock:
+            return sum(self.calls.values())
+
+    def _before_call(self, method, detail):
+        delay, failure = self._account(method, detail)
+        if delay:
+            time.sleep(delay)
+        if failure is not None:
+            raise _http_error(failure, 'Injected failure')
+
+    def _account(self, method, detail):
+        # Records the call; returns (latency to simulate, injected failure status or None)
+        with self._lock:
+            self.calls[method] += 1
+            if self.log_calls:
+                self.call_log.append((method, detail))
+            failure = None
+            for i, (status, methods) in enumerate(self._failures):
+                if methods is None or method in methods:
+                    failure = self._failures.pop(i)[0]
+                    break
+        delay = self.latency(method) if callable(self.latency) else self.latency
+        if self.jitter:
+            delay += self._random.uniform(0, self.jitter)
+        return delay, failure
+
+    # --- API operations (all take/return plain JSON-like structures) ---
+
+    def _sheet(self, spreadsheet_id, title):
+        sheets = self._spreadsheets.get(spreadsheet_id)
+        if sheets is None:
+            raise _http_error(404, f"Requested entity was not found: {spreadsheet_id}")
+        sheet = sheets.get(title)
+        if sheet is None:
+            raise _http_error(400, f"Unable to parse range: {title}")
+        return sheet
+
+    def _sheet_by_id(self, spreadsheet_id, sheet_id):
+        for sheet in self._spreadsheets.get(spreadsheet_id, {}).values():
+            if sheet.sheet_id == sheet_id:
+                return sheet
+        raise _http_error(400, f"No grid with id: {sheet_id}")
+
+    def _read(self, spreadsheet_id, range_name):
+        title, r0, c0, r1, c1 = parse_a1(range_name)
+        sheet = self._sheet(spreadsheet_id, title)
+        rows = sheet.rows[r0:None if r1 is None else r1 + 1]
+        values = []
+        for row in rows:
+            cells = row[c0:None if c1 is None else c1 + 1]
+            while cells and cells[-1] in ('', None):
+                cells = cells[:-1]
+            values.append([str(c) for c in cells])
+        while values and not values[-1]:
+            values.pop()
+        result = {'range': range_name, 'majorDimension': 'ROWS'}
+        if values:
+            result['values'] = values
+        return result
+
+    @staticmethod
+    def _cell_value(value, input_option):
+        if input_option == 'USER_ENTERED' and isinstance(value, str):
+            match = _HYPERLINK_RE.match(value)
+            if match:
+                return match.group(1)
+        return '' if value is None else str(value)
+
+    def _write(self, spreadsheet_id, range_name, values, input_option):
+        title, r0, c0, _, _ = parse_a1(range_name)
+        sheet = self._sheet(spreadsheet_id, title)
+        for i, row_values in enumerate(values):
+            row_idx = r0 + i
+            while len(sheet.rows) <= row_idx:
+                sheet.rows.append([])
+            row = sheet.rows[row_idx]
+            for j, value in enumerate(row_values):
+                col_idx = c0 + j
+                while len(row) <= col_idx:
+                    row.append('')
+                row[col_idx] = self._cell_value(value, input_option)
+        sheet.row_count = max(sheet.row_count, len(sheet.rows))
+        width = max((len(v) for v in values), default=0)
+        end = f"{_index_to_col(c0 + max(width, 1) - 1)}{r0 + max(len(values), 1)}"
+        return {
+            'spreadsheetId': spreadsheet_id,
+            'updatedRange': f"{quote_sheet_name(title)}!{_index_to_col(c0)}{r0 + 1}:{end}",
+            'updatedRows': len(values),
+            'updatedCells': sum(len(v) for v in values),
+        }
+
+    def values_get(self, spreadsheetId, range, **kwargs):
+        self._before_call('values.get', range)
+        with self._lock:
+            return self._read(spreadsheetId, range)
+
+    def values_batch_get(self, spreadsheetId, ranges, **kwargs):
+        if isinstance(ranges, str):
+            ranges = [ranges]
+        self._before_call('values.batchGet', ranges)
+        with self._lock:
+            return {
+                'spreadsheetId': spreadsheetId,
+                'valueRanges': [self._read(spreadsheetId, r) for r in ranges],
+            }
+
+    def values_update(self, spreadsheetId, range, body, valueInputOption='RAW', **kwargs):
+        self._before_call('values.update', range)
+        with self._lock:
+            return self._write(spreadsheetId, range, body.get('values', []), valueInputOption)
+
+    def values_batch_update(self, spreadsheetId, body, **kwargs):
+        data = body.get('data', [])
+        self._before_call('values.batchUpdate', [d['range'] for d in data])
+        input_option = body.get('valueInputOption', 'RAW')
+        with self._lock:
+            responses = [self._write(spreadsheetId, d['range'], d.get('values', []), input_option)
+                         for d in data]
+        return {
+            'spreadsheetId': spreadsheetId,
+            'totalUpdatedCells': sum(r['updatedCells'] for r in responses),
+            'responses': responses,
+        }
+
+    def values_append(self, spreadsheetId, range, body, valueInputOption='RAW', **kwargs):
+        self._before_call('values.append', range)
+        with self._lock:
+            title, _, c0, _, _ = parse_a1(range)
+            sheet = self._sheet(spreadsheetId, title)
+            last = len(sheet.rows)
+            while last > 0 and not any(c not in ('', None) for c in sheet.rows[last - 1]):
+                last -= 1
+            start = f"{quote_sheet_name(title)}!{_index_to_col(c0)}{last + 1}"
+            updates = self._write(spreadsheetId, start, body.get('values', []), valueInputOption)
+            return {'spreadsheetId': spreadsheetId, 'tableRange': range, 'updates': updates}
+
+    def spreadsheets_get(self, spreadsheetId, **kwargs):
+        self._before_call('spreadsheets.get', kwargs.get('fields'))
+        with self._lock:
+            sheets = self._spreadsheets.get(spreadsheetId)
+            if sheets is None:
+                raise _http_error(404, f"Requested entity was not found: {spreadsheetId}")
+            ordered = sorted(sheets.values(), key=lambda s: s.index)
+            return {
+                'spreadsheetId': spreadsheetId,
+                'sheets': [{'properties': s.properties()} for s in ordered],
+            }
+
+    def spreadsheets_batch_update(self, spreadsheetId, body, **kwargs):
+        requests = body.get('requests', [])
+        self._before_call('spreadsheets.batchUpdate', [next(iter(r)) for r in requests])
+        with self._lock:
+            sheets = self._spreadsheets.get(spreadsheetId)
+            if sheets is None:
+                raise _http_error(404, f"Requested entity was not found: {spreadsheetId}")
+            # Validate everything first so a bad request leaves the store untouched,
+            # like the real (atomic) batchUpdate.
+            snapshot = {t: (s.sheet_id, s.title, s.index, [list(r) for r in s.rows], s.row_count)
+                        for t, s in sheets.items()}
+            try:
+                replies = [self._apply_request(spreadsheetId, sheets, r) for r in requests]
+            except HttpError:
+                sheets.clear()
+                for title, (sid, t, idx, rows, row_count) in snapshot.items():
+                    sheets[title] = _Sheet(sid, t, idx, rows, row_count)
+                raise
+            return {'spreadsheetId': spreadsheetId, 'replies': replies}
+
+    def _apply_request(self, spreadsheet_id, sheets, request):
+        if 'addSheet' in request:
+            props = request['addSheet'].get('properties', {})
+            title = props.get('title') or f"Sheet{len(sheets) + 1}"
+            if title in sheets:
+                raise _http_error(400, f"A sheet with the name \"{title}\" already exists.")
+            sheet = self.add_sheet(title, [], spreadsheet_id, props.get('sheetId'))
+            return {'addSheet': {'properties': sheet.properties()}}
+
+        if 'duplicateSheet' in request:
+            req = request['duplicateSheet']
+            source = self._sheet_by_id(spreadsheet_id, req['sourceSheetId'])
+            title = req.get('newSheetName') or f"Copy of {source.title}"
+            if title in sheets:
+                raise _http_error(400, f"A sheet with the name \"{title}\" already exists.")
+            sheet = self.add_sheet(title, source.rows, spreadsheet_id, req.get('newSheetId'))
+            return {'duplicateSheet': {'properties': sheet.properties()}}
+
+        if 'updateSheetProperties' in request:
+            props = request['updateSheetProperties']['properties']
+            sheet = self._sheet_by_id(spreadsheet_id, props['sheetId'])
+            if 'title' in props and props['title'] != sheet.title:
+                if props['title'] in sheets:
+                    raise _http_error(400, f"A sheet with the name \"{props['title']}\" already exists.")
+                del sheets[sheet.title]
+                sheet.title = props['title']
+                sheets[sheet.title] = sheet
+            return {}
+
+        if 'deleteDimension' in request:
+            rng = request['deleteDimension']['range']
+            sheet = self._sheet_by_id(spreadsheet_id, rng['sheetId'])
+            if rng.get('dimension', 'ROWS') == 'ROWS':
+                del sheet.rows[rng['startIndex']:rng['endIndex']]
+                sheet.row_count -= rng['endIndex'] - rng['startIndex']
+            return {}
+
+        if 'deleteSheet' in request:
+            sheet = self._sheet_by_id(spreadsheet_id, request['deleteSheet']['sheetId'])
+            del sheets[sheet.title]
+            return {}
+
+        raise _http_error(400, f"Unsupported request: {next(iter(request))}")
+
+    def sheets_copy_to(self, spreadsheetId, sheetId, body, **kwargs):
+        self._before_call('sheets.copyTo', sheetId)
+        with self._lock:
+            source = self._sheet_by_id(spreadsheetId, sheetId)
+            destination = body['destinationSpreadsheetId']
+            dest_sheets = self.add_spreadsheet(destination)
+            title = f"Copy of {source.title}"
+            n = 2
+            while title in dest_sheets:
+                title = f"Copy of {source.title} {n}"
+                n += 1
+            return self.add_sheet(title, source.rows, destination).properties()
+
+    # --- googleapiclient-compatible facade ---
+
+    def service(self):
+        """Returns an object shaped like build('sheets', 'v4')."""
+        return _Service(self)
+
+    def install(self, handler=None):
+        """
+        Points sheets_handler (or the given module) at this emulator and
+        clears its caches. Returns the previous get_service for restore().
+        """
+        if handler is None:
+            import sheets_handler as handler
+        previous = handler.get_service
+        service = self.service()
+        handler.get_service = lambda: service
+        return previous
+
+
+class _StaticCredentials:
+    """Stands in for the service account where a benchmark builds real clients (cold_start.py)."""
+    token = 'emulator'
+    # Naive UTC, like google-auth
+    expiry = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(days=365)
+
+
+# Method id -> REST path after /v4/spreadsheets/{id}, as googleapiclient builds it
+_REST_PATHS = {
+    'sheets.spreadsheets.values.get': '/values/{range}',
+    'sheets.spreadsheets.values.batchGet': '/values:batchGet',
+    'sheets.spreadsheets.values.update': '/values/{range}',
+    'sheets.spreadsheets.values.batchUpdate': '/values:batchUpdate',
+    'sheets.spreadsheets.values.append': '/values/{range}:append',
+    'sheets.spreadsheets.get': '',
+    'sheets.spreadsheets.batchUpdate': ':batchUpdate',
+    'sheets.spreadsheets.sheets.copyTo': '/sheets/{sheetId}:copyTo',
+}
+
+
+class _Request:
+    """
+    Shaped like googleapiclient's HttpRequest: uri, body and postproc are set
+    the same way, and the response goes through a JSON round trip.
+    """
+
+    def __init__(self, method_id, func, kwargs):
+        self.methodId = method_id
+        self._func = func
+        self._kwargs = kwargs
+        path = _REST_PATHS[method_id].format(
+            range=quote(str(kwargs.get('range', '')), safe=''), sheetId=kwargs.get('sheetId', '')
+        )
+        query = [('ranges', r) for r in kwargs.get('ranges', [])]
+        self.uri = f"{_API_ROOT}/{quote(kwargs.get('spreadsheetId', ''), safe='')}{path}"
+        if query:
+            self.uri += '?' + urlencode(query)
+        self.body = json.dumps(kwargs['body']) if 'body' in kwargs else None
+        self.postproc = lambda resp, content: json.loads(content)
+
+    def execute(self, num_retries=0):
+        result = self._func(**self._kwargs)
+        return self.postproc({'status': '200'}, json.dumps(result).encode('utf-8'))
+
+
+class _Values:
+    def __init__(self, emulator):
+        self._e = emulator
+
+    def get(self, **kwargs):
+        return _Request('sheets.spreadsheets.values.get', self._e.values_get, kwargs)
+
+    def batchGet(self, **kwargs):
+        return _Request('sheets.spreadsheets.values.batchGet', self._e.values_batch_get, kwargs)
+
+    def update(self, **kwargs):
+        return _Request('sheets.spreadsheets.values.update', self._e.values_update, kwargs)
+
+    def batchUpdate(self, **kwargs):
+        return _Request('sheets.spreadsheets.values.batchUpdate', self._e.values_batch_update, kwargs)
+
+    def append(self, **kwargs):
+        return _Request('sheets.spreadsheets.values.append', self._e.values_append, kwargs)
+
+
+class _Sheets:
+    def __init__(self, emulator):
+        self._e = emulator
+
+    def copyTo(self, **kwargs):
+        return _Request('sheets.spreadsheets.sheets.copyTo', self._e.sheets_copy_to, kwargs)
+
+
+class _Spreadsheets:
+    def __init__(self, emulator):
+        self._e = emulator
+
+    def values(self):
+        return _Values(self._e)
+
+    def sheets(self):
+        return _Sheets(self._e)
+
+    def get(self, **kwargs):
+        return _Request('sheets.spreadsheets.get', self._e.spreadsheets_get, kwargs)
+
+    def batchUpdate(self, **kwargs):
+        return _Request('sheets.spreadsheets.batchUpdate', self._e.spreadsheets_batch_update, kwargs)
+
+
+class _Service:
+    def __init__(self, emulator):
+        self._e = emulator
+
+    def spreadsheets(self):
+        return _Spreadsheets(self._e)
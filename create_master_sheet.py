@@ -1,5 +1,5 @@
 from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
+from sheets_handler import build_sheets_client
 import os
 
 SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
@@ -12,7 +12,7 @@ def create_master_sheet():
         return
 
     creds = Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=SCOPES)
-    service = build('sheets', 'v4', credentials=creds)
+    service = build_sheets_client(credentials=creds)
 
     # 1. Check if sheet exists
     sheet_metadata = service.spreadsheets().get(spreadsheetId=SPREADSHEET_ID).execute()
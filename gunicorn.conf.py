@@ -0,0 +1,18 @@
+"""
+gunicorn settings, read automatically by `gunicorn app:app` from this directory.
+"""
+
+def post_fork(server, worker):
+    # Every worker has its own quota buckets; together they must stay within the project's
+    import sheets_handler
+    sheets_handler.split_quota(server.cfg.workers)
+
+    # Admin streams each hold a request thread; keep most threads for everyone else
+    import live_updates
+    live_updates.limit_streams(server.cfg.threads)
+
+    # Each worker warms its own caches (a no-op unless SHEETS_WARMUP is set).
+    # Only here, after the fork: a warm-up thread started in the master (as
+    # an import-time start would with --preload) holds locks such as the
+    # roster's, and the workers would inherit them locked.
+    sheets_handler.start_warm_up()
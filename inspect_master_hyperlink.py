@@ -1,5 +1,5 @@
 from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
+from sheets_handler import build_sheets_client
 import os
 
 SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
@@ -8,7 +8,7 @@ SERVICE_ACCOUNT_FILE = 'credentials.json'
 
 def get_service():
     creds = Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=SCOPES)
-    return build('sheets', 'v4', credentials=creds)
+    return build_sheets_client(credentials=creds)
 
 def check_master():
     service = get_service()
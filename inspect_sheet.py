@@ -1,5 +1,5 @@
 from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
+from sheets_handler import build_sheets_client
 import os
 import json
 
@@ -13,7 +13,7 @@ def inspect():
         return
 
     creds = Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=SCOPES)
-    service = build('sheets', 'v4', credentials=creds)
+    service = build_sheets_client(credentials=creds)
 
     # Inspect '質問' sheet
     target_sheet = '質問'
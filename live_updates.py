@@ -0,0 +1,147 @@
+"""
+Shared poller behind the admin dashboard's Server-Sent Events stream.
+
+One background thread per worker polls the roster, the 質問 sheet and every
+student's progress, diffs it against the previous poll and fans the deltas
+out to all connected admin tabs. It only runs while someone is subscribed,
+so ten open tabs cost one set of Sheets reads instead of ten. Reads go through
+the usual caches, so a change shows up once its cache entry expires (60 s for
+task statuses) rather than on the next poll.
+
+Every open stream holds a request thread of its worker, so a worker serves at
+most MAX_STREAMS of them; subscribe() turns the rest away and those tabs poll.
+"""
+import os
+import queue
+import threading
+import time
+
+import sheets_handler
+
+POLL_INTERVAL = float(os.environ.get('ADMIN_STREAM_POLL_SECONDS', '15'))
+# Events buffered per subscriber before it is told to reload instead
+SUBSCRIBER_QUEUE_SIZE = 256
+# Streams served at once by this worker; gunicorn.conf.py lowers it to a quarter of --threads
+MAX_STREAMS = int(os.environ.get('ADMIN_STREAM_MAX_CONNECTIONS', '2'))
+
+_SUBSCRIBERS = set()
+_LOCK = threading.Lock()
+_STATE = None  # {'students': {student_id: summary}, 'questions': {row_index: question}}
+_NEXT_EVENT_ID = 0
+
+def limit_streams(threads):
+    """
+    Caps the streams of a worker with `threads` request threads, so that
+    open admin tabs leave most of them to everyone else.
+    """
+    global MAX_STREAMS
+    MAX_STREAMS = min(MAX_STREAMS, threads // 4)
+
+def subscribe():
+    """
+    Registers a new stream. Returns the queue its events are delivered on,
+    or None if this worker already serves MAX_STREAMS streams.
+    """
+    q = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+    with _LOCK:
+        if len(_SUBSCRIBERS) >= MAX_STREAMS:
+            return None
+        _SUBSCRIBERS.add(q)
+    _ensure_poller()
+    return q
+
+def unsubscribe(q):
+    with _LOCK:
+        _SUBSCRIBERS.discard(q)
+
+def subscriber_count():
+    with _LOCK:
+        return len(_SUBSCRIBERS)
+
+def _publish(events):
+    global _NEXT_EVENT_ID
+    with _LOCK:
+        for event_type, data in events:
+            _NEXT_EVENT_ID += 1
+            event = {'id': _NEXT_EVENT_ID, 'event': event_type, 'data': data}
+            for q in _SUBSCRIBERS:
+                try:
+                    q.put_nowait(event)
+                except queue.Full:
+                    # A stalled tab: drop its backlog and have it reload
+                    with q.mutex:
+                        q.queue.clear()
+                    q.put_nowait({'id': _NEXT_EVENT_ID, 'event': 'reset', 'data': {}})
+
+def _ensure_poller():
+    # Under _LOCK, so it can't slip in between _poll_loop deciding to stop and forgetting itself
+    with _LOCK:
+        sheets_handler.start_once('admin-stream-poller', _poll_loop)
+
+def _poll_loop():
+    global _STATE
+    while True:
+        with _LOCK:
+            if not _SUBSCRIBERS:
+                # Nobody is watching: stop, and forget the baseline so the
+                # next subscriber doesn't get a burst of stale deltas
+                sheets_handler.forget_started('admin-stream-poller')
+                _STATE = None
+                return
+        started = time.monotonic()
+        try:
+            poll_once()
+        except Exception as e:
+            print(f"Error polling admin stream: {e}")
+        time.sleep(max(POLL_INTERVAL - (time.monotonic() - started), 1.0))
+
+def _snapshot():
+    # Default staleness: forcing fresh reads every poll would re-read Master and
+    # every student tab each POLL_INTERVAL, well past the read quota. The
+    # question index refreshes incrementally, so its 15 s TTL stays cheap.
+    with sheets_handler.sheets_priority(sheets_handler.PRIORITY_BULK):
+        students = sheets_handler.get_all_students()
+        questions = sheets_handler.get_unanswered_questions()
+        summaries = sheets_handler.get_student_summaries(students)
+    return {
+        # Keep the last known summary of a student whose tab failed to read
+        'students': {s['student_id']: s for s in summaries},
+        'questions': {q['row_index']: q for q in questions}
+    }
+
+def _diff(old, new):
+    events = []
+
+    for student_id, summary in new['students'].items():
+        previous = old['students'].get(student_id)
+        if previous is None:
+            events.append(('student_added', summary))
+        elif summary.get('error'):
+            new['students'][student_id] = previous
+        elif summary != previous:
+            events.append(('student_progress', summary))
+    for student_id in old['students']:
+        if student_id not in new['students']:
+            events.append(('student_removed', {'student_id': student_id}))
+
+    for row_index, question in new['questions'].items():
+        previous = old['questions'].get(row_index)
+        if previous is None or previous != question:
+            events.append(('question_added', question))
+    for row_index in old['questions']:
+        if row_index not in new['questions']:
+            events.append(('question_answered', {'row_index': row_index}))
+
+    return events
+
+def poll_once():
+    """
+    Takes one snapshot and publishes its deltas against the previous one.
+    """
+    global _STATE
+    snapshot = _snapshot()
+    if _STATE is not None:
+        events = _diff(_STATE, snapshot)
+        if events:
+            _publish(events)
+    _STATE = snapshot
@@ -1,5 +1,5 @@
 from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
+from sheets_handler import build_sheets_client
 import os
 
 SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
@@ -11,7 +11,7 @@ def get_service():
         print("Credentials file not found.")
         return None
     creds = Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=SCOPES)
-    return build('sheets', 'v4', credentials=creds)
+    return build_sheets_client(credentials=creds)
 
 def setup_unique_test_user():
     service = get_service()
@@ -1,21 +1,96 @@
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import contextvars
+import atexit
+import copy
+import functools
+import hashlib
 import os
 import json
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs, unquote, urlsplit
+import sheets_replica
+import telemetry
 
 SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
 # This is now the MASTER spreadsheet ID (containing 'Master', 'Questions', etc.)
 SPREADSHEET_ID = '1BtolneaNSnEbJlPGwwDm2WL6gJ86sUNtmj7AszT9v7U'
 SERVICE_ACCOUNT_FILE = 'credentials.json'
 
-def get_service():
+# --- Background Threads ---
+# Threads don't survive fork(), so every process (each gunicorn worker) starts
+# its own; the registry remembers which process started which thread.
+
+_STARTED = {}  # thread name -> pid of the process that started it
+_STARTED_LOCK = threading.Lock()
+
+def start_once(name, target):
+    """
+    Starts `target` on a daemon thread called `name`, unless this process
+    already started one under that name. Returns True if it started it.
+    """
+    with _STARTED_LOCK:
+        if _STARTED.get(name) == os.getpid():
+            return False
+        _STARTED[name] = os.getpid()
+    threading.Thread(target=target, name=name, daemon=True).start()
+    return True
+
+def forget_started(name):
+    """
+    Called by a thread that is about to exit, so the next start_once(name)
+    starts it again.
+    """
+    with _STARTED_LOCK:
+        _STARTED.pop(name, None)
+
+# --- Client Pool ---
+# Credentials (and their access token) are loaded once per process and shared.
+# The Sheets client itself sits on httplib2, which is not thread-safe, so every
+# thread gets its own client built on top of the shared credentials.
+# The Google client libraries are imported on first use, not at import time,
+# and clients are built from the discovery document bundled in discovery/.
+
+# Refresh the access token this long before it actually expires
+TOKEN_REFRESH_MARGIN = timedelta(seconds=int(os.environ.get('SHEETS_TOKEN_REFRESH_MARGIN', '300')))
+
+# Bundled copy of googleapiclient/discovery_cache/documents/sheets.v4.json;
+# refresh it from there when upgrading google-api-python-client
+DISCOVERY_DOCUMENT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'discovery', 'sheets.v4.json')
+
+_DISCOVERY_DOCUMENT = None
+_DISCOVERY_LOCK = threading.Lock()
+_CREDENTIALS = None
+_CREDENTIALS_LOCK = threading.Lock()
+_CLIENT_LOCAL = threading.local()
+_POOL_LOCK = threading.Lock()
+_POOL_THREADS = set()
+CLIENT_POOL_STATS = {
+    'hits': 0,              # get_service() served an existing per-thread client
+    'builds': 0,            # a new client had to be built
+    'credential_loads': 0,  # credentials parsed from env var / file
+    'token_refreshes': 0,   # proactive access token refreshes
+    'errors': 0,
+}
+
+def _count(stat):
+    with _POOL_LOCK:
+        CLIENT_POOL_STATS[stat] += 1
+
+def _load_credentials():
+    from google.oauth2.service_account import Credentials
+
     # Check for Environment Variable (for Render)
     creds_json_str = os.environ.get('GOOGLE_CREDENTIALS')
     if creds_json_str:
         try:
             creds_json = json.loads(creds_json_str)
-            creds = Credentials.from_service_account_info(creds_json, scopes=SCOPES)
-            return build('sheets', 'v4', credentials=creds)
+            return Credentials.from_service_account_info(creds_json, scopes=SCOPES)
         except Exception as e:
             print(f"Error loading credentials from Env Var: {e}")
             return None
@@ -23,50 +98,1340 @@ def get_service():
     # Fallback to local file
     if not os.path.exists(SERVICE_ACCOUNT_FILE):
         return None
-    creds = Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=SCOPES)
-    service = build('sheets', 'v4', credentials=creds)
-    return service
+    return Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=SCOPES)
 
-# Cache for Student Configs to avoid frequent lookups
-STUDENT_CONFIG_CACHE = {}
+def _token_needs_refresh(creds):
+    if not creds.token or creds.expiry is None:
+        return True
+    # google-auth keeps expiry as a naive UTC datetime
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    return creds.expiry - TOKEN_REFRESH_MARGIN <= now
 
-def get_student_config(student_id):
+def get_credentials():
     """
-    Retrieves the Spreadsheet ID and Sheet Name for a given student_id from the 'Master' sheet.
-    Returns a dict: {'spreadsheet_id': str, 'sheet_name': str}
+    Returns the process-wide service account credentials, refreshing the
+    access token shortly before it expires. Returns None if no credentials
+    are configured.
     """
-    if student_id in STUDENT_CONFIG_CACHE:
-        return STUDENT_CONFIG_CACHE[student_id]
+    global _CREDENTIALS
+    creds = _CREDENTIALS
+    if creds is None:
+        with _CREDENTIALS_LOCK:
+            if _CREDENTIALS is None:
+                _CREDENTIALS = _load_credentials()
+                if _CREDENTIALS is not None:
+                    _count('credential_loads')
+            creds = _CREDENTIALS
+        if creds is None:
+            return None
 
-    service = get_service()
-    if not service: 
+    if _token_needs_refresh(creds):
+        with _CREDENTIALS_LOCK:
+            # Another thread may have refreshed while we waited for the lock
+            if _token_needs_refresh(creds):
+                try:
+                    import httplib2
+                    from google_auth_httplib2 import Request
+                    creds.refresh(Request(httplib2.Http()))
+                    _count('token_refreshes')
+                except Exception as e:
+                    # AuthorizedHttp will retry the refresh on the next request
+                    print(f"Error refreshing access token: {e}")
+                    _count('errors')
+    return creds
+
+def get_service():
+    """
+    Returns the Sheets client for the current thread, building it on first use.
+    """
+    creds = get_credentials()
+    if creds is None:
         return None
 
+    local = _CLIENT_LOCAL
+    pid = os.getpid()
+    # A client inherited across fork() shares its sockets with the parent, so rebuild it
+    if getattr(local, 'service', None) is not None and local.pid == pid and local.creds is creds:
+        _count('hits')
+        return local.service
+
     try:
-        # Read 'Master' sheet
-        # A: Student ID, B: Spreadsheet ID, C: Name, D: Sheet Name (Optional)
-        result = service.spreadsheets().values().get(spreadsheetId=SPREADSHEET_ID, range='Master!A2:D').execute()
-        rows = result.get('values', [])
-        
-        for row in rows:
-            if len(row) >= 2 and row[0] == student_id:
-                config = {
-                    'spreadsheet_id': row[1],
-                    'name': row[2] if len(row) > 2 else 'Unknown',
-                    # Default to '行動管理' if Column D is missing or empty
-                    'sheet_name': row[3] if len(row) > 3 and row[3].strip() else '行動管理'
+        import httplib2
+        from google_auth_httplib2 import AuthorizedHttp
+        service = build_sheets_client(http=AuthorizedHttp(creds, http=httplib2.Http()))
+    except Exception as e:
+        print(f"Error building Sheets client: {e}")
+        _count('errors')
+        return None
+
+    local.service = service
+    local.pid = pid
+    local.creds = creds
+    with _POOL_LOCK:
+        CLIENT_POOL_STATS['builds'] += 1
+        _POOL_THREADS.add((pid, threading.get_ident()))
+    return service
+
+def build_sheets_client(credentials=None, http=None):
+    """
+    Builds a Sheets v4 client from the bundled discovery document, without
+    fetching it. Pass credentials, or an already authorized http.
+    """
+    from googleapiclient.discovery import build_from_document
+
+    global _DISCOVERY_DOCUMENT
+    if _DISCOVERY_DOCUMENT is None:
+        with _DISCOVERY_LOCK:
+            if _DISCOVERY_DOCUMENT is None:
+                with open(DISCOVERY_DOCUMENT_PATH, encoding='utf-8') as f:
+                    document = json.load(f)
+                # The client only reads schemas to render method docstrings,
+                # which is most of the cost of creating a resource. Stub them.
+                document['schemas'] = {
+                    name: {'id': name, 'type': 'object'} for name in document.get('schemas', {})
                 }
-                STUDENT_CONFIG_CACHE[student_id] = config
-                return config
-        
-        print(f"Student ID {student_id} not found in Master sheet.")
+                _DISCOVERY_DOCUMENT = json.dumps(document)
+
+    # Each client parses its own copy: building methods fills in their
+    # parameters in the document, so it cannot be shared between threads.
+    document = json.loads(_DISCOVERY_DOCUMENT)
+    service = build_from_document(document, credentials=credentials, http=http)
+    _cache_resources(service, document)
+    return service
+
+def _cache_resources(resource, description):
+    # service.spreadsheets() creates a new Resource, rendering the docstring of
+    # every method on it, on each call. Keep the first one for the client's life.
+    for name, child_description in description.get('resources', {}).items():
+        def cached(create=getattr(resource, name), child_description=child_description, built=[]):
+            if not built:
+                child = create()
+                _cache_resources(child, child_description)
+                built.append(child)
+            return built[0]
+        setattr(resource, name, cached)
+
+def get_client_pool_stats():
+    """
+    Returns a snapshot of the client pool counters for this process.
+    """
+    with _POOL_LOCK:
+        stats = dict(CLIENT_POOL_STATS)
+        pid = os.getpid()
+        stats['clients'] = sum(1 for p, _ in _POOL_THREADS if p == pid)
+    lookups = stats['hits'] + stats['builds']
+    stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+    stats['pid'] = pid
+    return stats
+
+# --- Request Scheduler ---
+# Every Sheets call goes through _execute(), which:
+#  - takes a token from the per-minute read or write bucket, sized to the project quota
+#    (split evenly between gunicorn workers, which each keep their own buckets),
+#  - lets interactive (student) calls go first; bulk (admin) calls wait while
+#    interactive callers are queued and never dip into the reserved share of a bucket,
+#  - retries 429 and 5xx responses with jittered exponential backoff,
+#  - counts every attempt in telemetry, labelled with the public function that
+#    made it (see _instrumented), the API method and the outcome,
+#  - and, while a request trace is open, records each attempt's ranges,
+#    quota wait, duration and response size in it (see app.py).
+
+SHEETS_READ_QUOTA_PER_MINUTE = int(os.environ.get('SHEETS_READ_QUOTA_PER_MINUTE', '60'))
+SHEETS_WRITE_QUOTA_PER_MINUTE = int(os.environ.get('SHEETS_WRITE_QUOTA_PER_MINUTE', '60'))
+# Share of each bucket that only interactive calls may use
+SHEETS_INTERACTIVE_RESERVE = float(os.environ.get('SHEETS_INTERACTIVE_RESERVE', '0.2'))
+# Longest a call waits for a token before giving up
+SHEETS_QUEUE_TIMEOUT = float(os.environ.get('SHEETS_QUEUE_TIMEOUT', '30'))
+SHEETS_MAX_RETRIES = int(os.environ.get('SHEETS_MAX_RETRIES', '5'))
+SHEETS_BACKOFF_BASE = 0.5
+SHEETS_BACKOFF_MAX = 32.0
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+PRIORITY_INTERACTIVE = 'interactive'
+PRIORITY_BULK = 'bulk'
+
+# Calls that must not be repeated after an ambiguous failure (e.g. a 5xx after the
+# server applied them): appends would duplicate rows, structural batchUpdates could
+# delete the wrong row. These are only retried on 429, which is never applied.
+_NON_IDEMPOTENT_METHODS = ('.append', '.copyTo', 'spreadsheets.batchUpdate')
+
+class SheetsQuotaError(Exception):
+    """No quota token became available within SHEETS_QUEUE_TIMEOUT."""
+
+class _TokenBucket:
+    def __init__(self, per_minute):
+        self.capacity = float(max(per_minute, 1))
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.interactive_waiting = 0
+        self.cond = threading.Condition()
+
+    def resize(self, per_minute):
+        with self.cond:
+            self._refill()
+            self.capacity = float(max(per_minute, 1))
+            self.rate = self.capacity / 60.0
+            self.tokens = min(self.tokens, self.capacity)
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, priority, timeout):
+        """
+        Takes one token. Returns the seconds spent waiting, raises SheetsQuotaError on timeout.
+        """
+        interactive = priority != PRIORITY_BULK
+        floor = 1.0 if interactive else 1.0 + SHEETS_INTERACTIVE_RESERVE * self.capacity
+        start = time.monotonic()
+        with self.cond:
+            if interactive:
+                self.interactive_waiting += 1
+            try:
+                while True:
+                    self._refill()
+                    blocked = not interactive and self.interactive_waiting > 0
+                    if not blocked and self.tokens >= floor:
+                        self.tokens -= 1
+                        return time.monotonic() - start
+                    remaining = timeout - (time.monotonic() - start)
+                    if remaining <= 0:
+                        raise SheetsQuotaError(f"No Sheets quota available after {timeout:.0f}s")
+                    wait = remaining if blocked else (floor - self.tokens) / self.rate
+                    self.cond.wait(min(remaining, max(wait, 0.01)))
+            finally:
+                if interactive:
+                    self.interactive_waiting -= 1
+                    self.cond.notify_all()
+
+_READ_BUCKET = _TokenBucket(SHEETS_READ_QUOTA_PER_MINUTE)
+_WRITE_BUCKET = _TokenBucket(SHEETS_WRITE_QUOTA_PER_MINUTE)
+_PRIORITY = contextvars.ContextVar('sheets_priority', default=PRIORITY_INTERACTIVE)
+_SCHEDULER_LOCK = threading.Lock()
+SCHEDULER_STATS = {
+    'reads': 0,
+    'writes': 0,
+    'throttled': 0,       # calls that had to wait for a token
+    'wait_seconds': 0.0,
+    'retries': 0,
+    'failures': 0,        # calls that failed after retries (or were not retryable)
+    'quota_timeouts': 0,
+}
+
+SHEETS_CALLS = telemetry.counter(
+    'sheets_api_calls_total', 'Sheets API call attempts.', ['handler', 'operation', 'outcome']
+)
+SHEETS_CALL_SECONDS = telemetry.histogram(
+    'sheets_api_call_duration_seconds', 'Time spent in one Sheets API call attempt.', ['handler', 'operation']
+)
+SHEETS_QUOTA_WAIT_SECONDS = telemetry.histogram(
+    'sheets_api_quota_wait_seconds', 'Time a Sheets call waited for a quota token.', ['priority']
+)
+CACHE_REQUESTS = telemetry.counter(
+    'sheets_cache_requests_total', 'Lookups in the Sheets read caches.', ['cache', 'result']
+)
+# Public function on whose behalf the current Sheets calls are made
+_HANDLER = contextvars.ContextVar('sheets_handler', default=None)
+
+def _scheduler_count(stat, amount=1):
+    with _SCHEDULER_LOCK:
+        SCHEDULER_STATS[stat] += amount
+
+def split_quota(workers):
+    """
+    Sizes this process's buckets to its share of the project quota when
+    `workers` processes each keep their own (called from gunicorn's post_fork).
+    A busy worker can't borrow an idle one's share.
+    """
+    workers = max(int(workers), 1)
+    _READ_BUCKET.resize(SHEETS_READ_QUOTA_PER_MINUTE / workers)
+    _WRITE_BUCKET.resize(SHEETS_WRITE_QUOTA_PER_MINUTE / workers)
+
+def get_scheduler_stats():
+    with _SCHEDULER_LOCK:
+        stats = dict(SCHEDULER_STATS)
+    stats['wait_seconds'] = round(stats['wait_seconds'], 3)
+    stats['read_tokens'] = round(_READ_BUCKET.tokens, 1)
+    stats['write_tokens'] = round(_WRITE_BUCKET.tokens, 1)
+    stats['reads_per_minute'] = round(_READ_BUCKET.capacity, 1)
+    stats['writes_per_minute'] = round(_WRITE_BUCKET.capacity, 1)
+    return stats
+
+@contextmanager
+def sheets_priority(priority):
+    """
+    Runs the enclosed Sheets calls (on this thread, and fan-out threads run in
+    a copy of its context) at the given priority. Admin bulk jobs wrap
+    themselves in sheets_priority(PRIORITY_BULK).
+    """
+    token = _PRIORITY.set(priority)
+    try:
+        yield
+    finally:
+        _PRIORITY.reset(token)
+
+def _current_priority():
+    return _PRIORITY.get()
+
+@contextmanager
+def _handler_scope(name):
+    # The outermost scope names the calls: get_student_dashboard's roster
+    # load is counted under get_student_dashboard, not get_student_config
+    if _HANDLER.get() is not None:
+        yield
+        return
+    token = _HANDLER.set(name)
+    try:
+        yield
+    finally:
+        _HANDLER.reset(token)
+
+def _instrumented(func):
+    """
+    Labels the Sheets calls made by a public function with its name in telemetry.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with _handler_scope(func.__name__):
+            return func(*args, **kwargs)
+    return wrapper
+
+def _current_handler():
+    return _HANDLER.get() or 'other'
+
+def _operation(method):
+    # 'sheets.spreadsheets.values.batchGet' -> 'values.batchGet'
+    return method.replace('sheets.spreadsheets.', '', 1) or 'unknown'
+
+def _count_cache(cache, hit):
+    CACHE_REQUESTS.inc(cache, 'hit' if hit else 'miss')
+
+def _record_call(handler, operation, outcome, started, trace=None, waited=0.0):
+    elapsed = time.perf_counter() - started
+    SHEETS_CALLS.inc(handler, operation, outcome)
+    SHEETS_CALL_SECONDS.observe(elapsed, handler, operation)
+    if trace is not None:
+        _trace_span(trace, handler, operation, outcome, elapsed, waited)
+
+def _trace_span(trace, handler, operation, outcome, elapsed, waited):
+    # trace is (ranges, [response sizes of this attempt])
+    ranges, received = trace
+    telemetry.record_span({
+        'handler': handler,
+        'operation': operation,
+        'ranges': ranges,
+        'outcome': outcome,
+        'ms': round(elapsed * 1000, 1),
+        'wait_ms': round(waited * 1000, 1),
+        'bytes': sum(received),
+    })
+    received.clear()
+
+def _request_ranges(request):
+    # A1 ranges a googleapiclient request reads or writes, from its URI and body
+    parts = urlsplit(getattr(request, 'uri', '') or '')
+    ranges = parse_qs(parts.query).get('ranges', [])
+    if '/values/' in parts.path:
+        range_name = unquote(parts.path.split('/values/', 1)[1])
+        for suffix in (':append', ':clear'):
+            if range_name.endswith(suffix):
+                range_name = range_name[:-len(suffix)]
+        ranges.append(range_name)
+    body = getattr(request, 'body', None)
+    if body and parts.path.endswith('values:batchUpdate'):
+        ranges += [d.get('range') for d in json.loads(body).get('data', [])]
+    return ranges
+
+def _trace_request(request):
+    """
+    Returns the (ranges, response sizes) of a request for the current trace.
+    The sizes are collected by wrapping the request's postproc, which is
+    handed the raw response body.
+    """
+    received = []
+    postproc = getattr(request, 'postproc', None)
+    if postproc is not None:
+        def measure(resp, content):
+            received.append(len(content or b''))
+            return postproc(resp, content)
+        request.postproc = measure
+    return _request_ranges(request), received
+
+def _call_profile(method):
+    """
+    Returns (is_read, idempotent) for a Sheets API method id.
+    """
+    is_read = method.endswith('.get') or method.endswith('.batchGet')
+    return is_read, not method.endswith(_NON_IDEMPOTENT_METHODS)
+
+def _http_status(error):
+    status = getattr(getattr(error, 'resp', None), 'status', None)
+    try:
+        return int(status)
+    except (TypeError, ValueError):
         return None
 
+def _retry_delay(error, attempt):
+    # Honour Retry-After when Google sends one, otherwise full-jitter backoff
+    retry_after = getattr(getattr(error, 'resp', None), 'get', lambda key: None)('retry-after')
+    if retry_after:
+        try:
+            return min(float(retry_after), SHEETS_BACKOFF_MAX)
+        except ValueError:
+            pass
+    return random.uniform(0, min(SHEETS_BACKOFF_MAX, SHEETS_BACKOFF_BASE * (2 ** attempt)))
+
+def _execute(request):
+    """
+    Executes a googleapiclient request under the quota buckets with retries.
+    """
+    from googleapiclient.errors import HttpError
+    from httplib2 import HttpLib2Error
+
+    method = getattr(request, 'methodId', '') or ''
+    is_read, idempotent = _call_profile(method)
+    bucket = _READ_BUCKET if is_read else _WRITE_BUCKET
+    priority = _current_priority()
+    handler, operation = _current_handler(), _operation(method)
+    trace = _trace_request(request) if telemetry.tracing() else None
+    _scheduler_count('reads' if is_read else 'writes')
+
+    attempt = 0
+    while True:
+        try:
+            waited = bucket.acquire(priority, SHEETS_QUEUE_TIMEOUT)
+        except SheetsQuotaError:
+            _scheduler_count('quota_timeouts')
+            SHEETS_CALLS.inc(handler, operation, 'quota_timeout')
+            if trace is not None:
+                _trace_span(trace, handler, operation, 'quota_timeout', 0.0, SHEETS_QUEUE_TIMEOUT)
+            raise
+        SHEETS_QUOTA_WAIT_SECONDS.observe(waited, priority)
+        if waited > 0.001:
+            _scheduler_count('throttled')
+            _scheduler_count('wait_seconds', waited)
+
+        started = time.perf_counter()
+        try:
+            result = request.execute()
+            _record_call(handler, operation, 'ok', started, trace, waited)
+            return result
+        except HttpError as e:
+            status = _http_status(e)
+            retryable = status == 429 or (idempotent and status in RETRYABLE_STATUSES)
+            error = e
+        except (ConnectionError, TimeoutError, HttpLib2Error) as e:
+            retryable = idempotent
+            error = e
+        except Exception:
+            _record_call(handler, operation, 'error', started, trace, waited)
+            _scheduler_count('failures')
+            raise
+
+        if not retryable or attempt >= SHEETS_MAX_RETRIES:
+            _record_call(handler, operation, 'error', started, trace, waited)
+            _scheduler_count('failures')
+            raise error
+        _record_call(handler, operation, 'retry', started, trace, waited)
+
+        delay = _retry_delay(error, attempt)
+        attempt += 1
+        _scheduler_count('retries')
+        print(f"Sheets call {method} failed ({error}), retry {attempt}/{SHEETS_MAX_RETRIES} in {delay:.1f}s")
+        time.sleep(delay)
+
+# --- Tab Catalog ---
+# Title -> sheetId / grid size for every tab, loaded with a narrow field mask
+# instead of downloading the full spreadsheet metadata on each lookup.
+# Anything that adds, renames or deletes tabs must call invalidate_sheet_catalog().
+# With the replica enabled, catalogs are shared there by all workers on the node.
+
+SHEET_CATALOG_TTL_SECONDS = float(os.environ.get('SHEET_CATALOG_TTL_SECONDS', '600'))
+SHEET_CATALOG_FIELDS = 'sheets.properties(sheetId,title,gridProperties(rowCount,columnCount))'
+# Replica key the catalog is stored under, next to the spreadsheet's ranges
+SHEET_CATALOG_REPLICA_KEY = '#catalog'
+
+_SHEET_CATALOGS = {}  # spreadsheet_id -> {'sheets': {title: {...}}, 'loaded_at': float}
+_SHEET_CATALOG_LOCK = threading.Lock()
+
+def _sheet_catalog(service, spreadsheet_id=SPREADSHEET_ID):
+    """
+    Returns {title: {'sheet_id': int, 'row_count': int, 'column_count': int}}
+    in tab order. Raises on API errors, like the call it replaces.
+    """
+    _apply_remote_invalidations()
+    catalog = _SHEET_CATALOGS.get(spreadsheet_id)
+    fresh = catalog is not None and time.monotonic() - catalog['loaded_at'] <= SHEET_CATALOG_TTL_SECONDS
+    _count_cache('catalog', fresh)
+    if fresh:
+        return catalog['sheets']
+
+    sheets = None
+    if sheets_replica.enabled():
+        sheets = _replica_get(spreadsheet_id, SHEET_CATALOG_REPLICA_KEY, SHEET_CATALOG_TTL_SECONDS)
+    if sheets is None:
+        sheets = _load_sheet_catalog(service, spreadsheet_id)
+
+    with _SHEET_CATALOG_LOCK:
+        _SHEET_CATALOGS[spreadsheet_id] = {'sheets': sheets, 'loaded_at': time.monotonic()}
+    return sheets
+
+def _load_sheet_catalog(service, spreadsheet_id):
+    read_started_at = time.time()
+    spreadsheet = _execute(service.spreadsheets().get(spreadsheetId=spreadsheet_id, fields=SHEET_CATALOG_FIELDS))
+    sheets = {}
+    for s in spreadsheet.get('sheets', []):
+        props = s['properties']
+        grid = props.get('gridProperties', {})
+        sheets[props['title']] = {
+            'sheet_id': props['sheetId'],
+            'row_count': grid.get('rowCount', 0),
+            'column_count': grid.get('columnCount', 0)
+        }
+    _replica_put(spreadsheet_id, {SHEET_CATALOG_REPLICA_KEY: sheets}, read_started_at)
+    return sheets
+
+def invalidate_sheet_catalog(spreadsheet_id=SPREADSHEET_ID):
+    _drop_sheet_catalog(spreadsheet_id)
+    _invalidate_replica(spreadsheet_id, [SHEET_CATALOG_REPLICA_KEY])
+    _publish_invalidation('catalog', spreadsheet_id)
+
+def _drop_sheet_catalog(spreadsheet_id):
+    with _SHEET_CATALOG_LOCK:
+        _SHEET_CATALOGS.pop(spreadsheet_id, None)
+
+# --- Master Roster Index ---
+# The whole Master sheet is read in one call and indexed by student_id.
+# Lookups are served from the index; once it is older than ROSTER_TTL_SECONDS
+# it is still served while a background thread re-reads the sheet.
+
+ROSTER_TTL_SECONDS = float(os.environ.get('ROSTER_TTL_SECONDS', '300'))
+# An unknown ID re-reads Master (to pick up students just added in the sheet)
+# only if the index is at least this old
+ROSTER_MISS_RELOAD_SECONDS = float(os.environ.get('ROSTER_MISS_RELOAD_SECONDS', '30'))
+# Unknown IDs are remembered for this long, up to NEGATIVE_CACHE_MAX_SIZE entries
+NEGATIVE_CACHE_TTL_SECONDS = float(os.environ.get('ROSTER_NEGATIVE_CACHE_TTL_SECONDS', '300'))
+NEGATIVE_CACHE_MAX_SIZE = int(os.environ.get('ROSTER_NEGATIVE_CACHE_MAX_SIZE', '1024'))
+
+DEFAULT_SHEET_NAME = '行動管理'
+
+_ROSTER = None
+_ROSTER_GENERATION = 0
+_ROSTER_LOCK = threading.Lock()
+_ROSTER_REFRESHING = False
+_NEGATIVE_CACHE = OrderedDict()  # student_id -> expiry (monotonic)
+_NEGATIVE_CACHE_LOCK = threading.Lock()
+
+def _build_roster(rows):
+    """
+    Indexes the rows of Master!A2:D.
+    A: Student ID, B: Spreadsheet ID, C: Name, D: Sheet Name (Optional)
+    """
+    configs = {}
+    students = []
+    row_numbers = {}
+
+    for i, row in enumerate(rows):
+        if not row or not row[0]:
+            continue
+        student_id = row[0]
+        # 1-based sheet row, used by delete_student (duplicates are all kept)
+        row_numbers.setdefault(student_id, []).append(i + 2)
+        if len(row) < 2:
+            continue
+
+        # Default to '行動管理' if Column D is missing or empty
+        sheet_name = row[3] if len(row) > 3 and row[3].strip() else DEFAULT_SHEET_NAME
+        if student_id not in configs:
+            configs[student_id] = {
+                'spreadsheet_id': row[1],
+                'name': row[2] if len(row) > 2 else 'Unknown',
+                'sheet_name': sheet_name
+            }
+        if len(row) >= 3: # Must have ID, SpreadsheetID, Name
+            students.append({
+                'student_id': student_id,
+                'spreadsheet_id': row[1],
+                'name': row[2],
+                'sheet_name': sheet_name
+            })
+
+    return {
+        'configs': configs,
+        'students': students,
+        'row_numbers': row_numbers,
+        'loaded_at': time.monotonic()
+    }
+
+def _load_roster(max_staleness=None):
+    """
+    Reads Master and installs a fresh index. Returns it, or None on failure.
+    """
+    global _ROSTER
+    generation = _ROSTER_GENERATION
+
+    service = get_service()
+    if not service:
+        return None
+
+    try:
+        rows = _batch_get_values(service, SPREADSHEET_ID, [MASTER_RANGE], max_staleness)[0]
+        roster = _build_roster(rows)
     except Exception as e:
-        print(f"Error fetching student config for {student_id}: {e}")
+        print(f"Error loading Master roster: {e}")
         return None
 
-def get_tasks(student_id):
+    # Don't let a read that started before invalidate_roster() overwrite it
+    if generation == _ROSTER_GENERATION:
+        _ROSTER = roster
+    return roster
+
+def _refresh_roster_in_background():
+    global _ROSTER_REFRESHING
+    with _ROSTER_LOCK:
+        if _ROSTER_REFRESHING:
+            return
+        _ROSTER_REFRESHING = True
+
+    def run():
+        global _ROSTER_REFRESHING
+        try:
+            with sheets_priority(PRIORITY_BULK), _handler_scope('refresh_roster'):
+                _load_roster()
+        finally:
+            _ROSTER_REFRESHING = False
+
+    threading.Thread(target=run, name='roster-refresh', daemon=True).start()
+
+def _get_roster(max_age=None):
+    """
+    Returns the roster index, loading it synchronously if it is missing or
+    older than max_age seconds. A merely stale (TTL) index is returned as-is
+    and refreshed in the background.
+    """
+    _apply_remote_invalidations()
+    roster = _ROSTER
+    missing = roster is None or (max_age is not None and time.monotonic() - roster['loaded_at'] > max_age)
+    _count_cache('roster', not missing)
+    if missing:
+        with _ROSTER_LOCK:
+            # Another thread may have loaded it while we waited
+            roster = _ROSTER
+            if roster is None or (max_age is not None and time.monotonic() - roster['loaded_at'] > max_age):
+                roster = _load_roster(max_staleness=max_age)
+        return roster
+
+    if time.monotonic() - roster['loaded_at'] > ROSTER_TTL_SECONDS:
+        _refresh_roster_in_background()
+    return roster
+
+def invalidate_roster(student_id=None):
+    """
+    Drops the roster index so the next lookup re-reads Master.
+    Call after writing to Master. If student_id is given, it is also removed
+    from the unknown-ID cache.
+    """
+    _drop_roster(student_id)
+    _invalidate_replica(SPREADSHEET_ID, [MASTER_RANGE])
+    _publish_invalidation('roster', student_id)
+
+def _drop_roster(student_id=None):
+    global _ROSTER, _ROSTER_GENERATION
+    with _ROSTER_LOCK:
+        _ROSTER_GENERATION += 1
+        _ROSTER = None
+    with _NEGATIVE_CACHE_LOCK:
+        if student_id is None:
+            _NEGATIVE_CACHE.clear()
+        else:
+            _NEGATIVE_CACHE.pop(student_id, None)
+
+def _is_known_missing(student_id):
+    with _NEGATIVE_CACHE_LOCK:
+        expiry = _NEGATIVE_CACHE.get(student_id)
+        if expiry is None:
+            return False
+        if expiry < time.monotonic():
+            del _NEGATIVE_CACHE[student_id]
+            return False
+        return True
+
+def _remember_missing(student_id):
+    with _NEGATIVE_CACHE_LOCK:
+        _NEGATIVE_CACHE[student_id] = time.monotonic() + NEGATIVE_CACHE_TTL_SECONDS
+        _NEGATIVE_CACHE.move_to_end(student_id)
+        while len(_NEGATIVE_CACHE) > NEGATIVE_CACHE_MAX_SIZE:
+            _NEGATIVE_CACHE.popitem(last=False)
+
+@_instrumented
+def get_student_config(student_id):
+    """
+    Retrieves the Spreadsheet ID and Sheet Name for a given student_id from the 'Master' sheet.
+    Returns a dict: {'spreadsheet_id': str, 'name': str, 'sheet_name': str}
+    """
+    if not student_id:
+        return None
+
+    roster = _get_roster()
+    if not roster:
+        return None
+
+    config = roster['configs'].get(student_id)
+    if config:
+        return dict(config)
+
+    if _is_known_missing(student_id):
+        return None
+
+    # The student may have been added to Master since the index was built
+    roster = _get_roster(max_age=ROSTER_MISS_RELOAD_SECONDS)
+    config = roster['configs'].get(student_id) if roster else None
+    if config:
+        return dict(config)
+
+    print(f"Student ID {student_id} not found in Master sheet.")
+    _remember_missing(student_id)
+    return None
+
+# Regions of a student's tab: the header block (goals, current week, mentor)
+# and the task table below it.
+USER_INFO_CELLS = 'A1:F5'
+TASKS_CELLS = 'A6:E'
+TASKS_FIRST_ROW = 6
+
+def _tab_range(sheet_name, cells):
+    # Quote the sheet name: student tabs are named like '行動管理④'
+    return f"'{sheet_name}'!{cells}"
+
+def _parse_tasks(rows):
+    """
+    Parses the rows of the task table (starting at TASKS_FIRST_ROW) into task dicts.
+    """
+    tasks = []
+    current_week = ""
+
+    for i, row in enumerate(rows):
+        sheet_row_index = TASKS_FIRST_ROW + i
+        col_a = row[0] if len(row) > 0 else ""
+        col_b = row[1] if len(row) > 1 else ""
+        col_c = row[2] if len(row) > 2 else ""
+        col_d = row[3] if len(row) > 3 else "未着手"
+
+        if col_a.strip().startswith("Week"):
+            current_week = col_a.strip()
+
+        title = col_b.strip()
+        if title:
+            tasks.append({
+                "id": sheet_row_index,
+                "title": title,
+                "description": col_c,
+                "status": col_d,
+                "week": current_week
+            })
+    return tasks
+
+def _parse_user_info(rows):
+    """
+    Parses the header block (A1:F5) of a student's tab.
+    """
+    info = {
+        "monthly_goal": "",
+        "bottleneck": "",
+        "weekly_focus": "",
+        "current_week": "",
+        "mentor": ""
+    }
+
+    if len(rows) > 1:
+        row2 = rows[1]
+        if len(row2) > 0: info["monthly_goal"] = row2[0]
+        if len(row2) > 2: info["bottleneck"] = row2[2]
+
+    if len(rows) > 3:
+        row4 = rows[3]
+        if len(row4) > 0: info["weekly_focus"] = row4[0]
+        if len(row4) > 3: info["current_week"] = row4[3]
+        if len(row4) > 4: info["mentor"] = row4[4]
+
+    return info
+
+# --- Local Read Replica ---
+# With SHEETS_REPLICA_PATH set, every range read is mirrored into a local SQLite
+# database (see sheets_replica.py), and reads are served from it while the copy is
+# younger than the caller's freshness bound (SHEETS_REPLICA_MAX_STALENESS by default).
+# A background job re-syncs Master, 質問, Schedules, Sales and every student tab
+# every SHEETS_REPLICA_SYNC_INTERVAL seconds; one worker per node runs it.
+# Writes invalidate the ranges they touch.
+
+REPLICA_PATH = os.environ.get('SHEETS_REPLICA_PATH', '')
+REPLICA_MAX_STALENESS = float(os.environ.get('SHEETS_REPLICA_MAX_STALENESS', '120'))
+REPLICA_SYNC_INTERVAL = float(os.environ.get('SHEETS_REPLICA_SYNC_INTERVAL', '60'))
+
+# Shared tabs of the master spreadsheet and the ranges the app reads from them
+MASTER_RANGE = 'Master!A2:D'
+QUESTIONS_RANGE = '質問!A2:E'
+SCHEDULES_RANGE = 'Schedules!A2:E'
+SALES_RANGE = 'Sales!A2:C'
+# 質問 is left out: it is read incrementally through the question index
+SHARED_RANGES = {
+    'Master': MASTER_RANGE,
+    'Schedules': SCHEDULES_RANGE,
+    'Sales': SALES_RANGE,
+}
+
+try:
+    sheets_replica.configure(REPLICA_PATH)
+except Exception as e:
+    print(f"Error opening replica at {REPLICA_PATH}, continuing without it: {e}")
+    sheets_replica.configure(None)
+
+def _replica_get(spreadsheet_id, range_name, max_staleness):
+    try:
+        rows = sheets_replica.get_range(spreadsheet_id, range_name, max_staleness)
+    except Exception as e:
+        print(f"Error reading replica: {e}")
+        rows = None
+    _count_cache('replica', rows is not None)
+    return rows
+
+def _replica_put(spreadsheet_id, rows_by_range, read_started_at):
+    try:
+        sheets_replica.put_ranges(spreadsheet_id, rows_by_range, read_started_at)
+    except Exception as e:
+        print(f"Error writing replica: {e}")
+
+def _invalidate_replica(spreadsheet_id, range_names):
+    try:
+        sheets_replica.invalidate(spreadsheet_id, range_names)
+    except Exception as e:
+        print(f"Error invalidating replica: {e}")
+
+# --- Cross-worker Invalidation ---
+# In-memory caches (roster, tab catalogs, student regions, views, question index,
+# metrics) are per worker. With the replica enabled, every write also publishes
+# what it invalidated to the replica's log, and each cache applies the entries
+# published by other workers before serving, so all workers on the node see a
+# change on their next read instead of after their TTL.
+
+def _publish_invalidation(scope, key=None):
+    try:
+        sheets_replica.publish_invalidation(scope, key)
+    except Exception as e:
+        print(f"Error publishing {scope} invalidation: {e}")
+
+def _apply_remote_invalidations():
+    try:
+        changes = sheets_replica.poll_invalidations()
+    except Exception as e:
+        print(f"Error polling invalidations: {e}")
+        return
+    for scope, key in changes:
+        if scope == 'roster':
+            _drop_roster(key)
+        elif scope == 'catalog':
+            _drop_sheet_catalog(key)
+        elif scope == 'student':
+            _drop_student_cache(*(json.loads(key) if key else (None, None)))
+        elif scope == 'view':
+            _drop_view(key)
+        elif scope == 'questions':
+            _drop_question_index()
+        elif scope == 'question_submitted':
+            _expire_question_index()
+        elif scope == 'question_answered':
+            _note_question_answered(int(key))
+        elif scope == 'metrics':
+            _mark_metrics_dirty()
+
+def _replica_lookup(spreadsheet_id, ranges, max_staleness=None):
+    # Returns ({range: rows} served by the replica, [ranges to read from Sheets])
+    if max_staleness is None:
+        max_staleness = REPLICA_MAX_STALENESS
+
+    rows_by_range = {}
+    if sheets_replica.enabled():
+        _start_replica_sync()
+        if max_staleness > 0:
+            for range_name in ranges:
+                rows = _replica_get(spreadsheet_id, range_name, max_staleness)
+                if rows is not None:
+                    rows_by_range[range_name] = rows
+    return rows_by_range, [r for r in ranges if r not in rows_by_range]
+
+def _batch_get_values(service, spreadsheet_id, ranges, max_staleness=None):
+    """
+    Reads several ranges of one spreadsheet in a single values.batchGet call.
+    Returns the rows of each range, in the order the ranges were given.
+    Ranges mirrored in the replica within max_staleness seconds are not re-read;
+    pass max_staleness=0 to force a read from Sheets.
+    """
+    rows_by_range, missing = _replica_lookup(spreadsheet_id, ranges, max_staleness)
+    if missing:
+        read_started_at = time.time()
+        result = _execute(service.spreadsheets().values().batchGet(spreadsheetId=spreadsheet_id, ranges=missing))
+        value_ranges = result.get('valueRanges', [])
+        fetched = {r: vr.get('values', []) for r, vr in zip(missing, value_ranges)}
+        _replica_put(spreadsheet_id, fetched, read_started_at)
+        rows_by_range.update(fetched)
+    return [rows_by_range.get(r, []) for r in ranges]
+
+def _start_replica_sync():
+    # Every worker runs one, but only the lease holder syncs
+    def run():
+        owner = str(os.getpid())
+        # Reads fill the replica as they go, so the first full sync can wait one interval
+        while True:
+            time.sleep(REPLICA_SYNC_INTERVAL)
+            try:
+                if sheets_replica.try_acquire_lease('sync', owner, REPLICA_SYNC_INTERVAL * 2):
+                    sync_replica()
+            except Exception as e:
+                print(f"Error syncing replica: {e}")
+
+    start_once('replica-sync', run)
+
+def get_replica_stats():
+    try:
+        return sheets_replica.stats()
+    except Exception as e:
+        return {'enabled': sheets_replica.enabled(), 'error': str(e)}
+
+@_instrumented
+def sync_replica():
+    """
+    Re-reads the shared tabs and every student tab into the replica with
+    batched reads. Returns the number of ranges synced.
+    """
+    service = get_service()
+    if not service or not sheets_replica.enabled():
+        return 0
+
+    with sheets_priority(PRIORITY_BULK):
+        catalog = _sheet_catalog(service)
+        shared = [range_name for tab, range_name in SHARED_RANGES.items() if tab in catalog]
+        shared_rows = dict(zip(shared, _batch_get_values(service, SPREADSHEET_ID, shared, max_staleness=0)))
+
+        roster = _build_roster(shared_rows.get(MASTER_RANGE, []))
+        requests = []
+        for student in roster['students']:
+            for cells in (USER_INFO_CELLS, TASKS_CELLS):
+                requests.append((student['spreadsheet_id'], _tab_range(student['sheet_name'], cells)))
+        fetched = _fetch_ranges(requests, max_staleness=0)
+
+    return len(shared_rows) + len(fetched)
+
+# --- Per-student Read Cache ---
+# Parsed regions of student tabs, keyed by (spreadsheet_id, sheet_name, region).
+# The header block rarely changes, so it is kept longer than the task table.
+# Callers always get copies, so they can decorate the results freely. Each
+# entry also keeps a content hash of its value, used to build response ETags.
+
+STUDENT_CACHE_MAX_ENTRIES = int(os.environ.get('STUDENT_CACHE_MAX_ENTRIES', '2048'))
+STUDENT_CACHE_TTLS = {
+    'user_info': float(os.environ.get('USER_INFO_CACHE_TTL_SECONDS', '300')),
+    'tasks': float(os.environ.get('TASKS_CACHE_TTL_SECONDS', '60')),
+}
+STUDENT_REGIONS = {
+    'user_info': (USER_INFO_CELLS, _parse_user_info),
+    'tasks': (TASKS_CELLS, _parse_tasks),
+}
+
+_STUDENT_CACHE = OrderedDict()  # key -> (expiry, stored_at, value, etag)
+_STUDENT_CACHE_LOCK = threading.Lock()
+
+def content_hash(value):
+    """
+    Stable hash of a JSON-serialisable value, used as an ETag.
+    """
+    encoded = json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha1(encoded.encode('utf-8')).hexdigest()
+
+def _copy_region(value):
+    if isinstance(value, list):
+        return [dict(item) for item in value]
+    return dict(value)
+
+def _student_cache_get(spreadsheet_id, sheet_name, region, max_staleness=None):
+    _apply_remote_invalidations()
+    key = (spreadsheet_id, sheet_name, region)
+    now = time.monotonic()
+    with _STUDENT_CACHE_LOCK:
+        entry = _STUDENT_CACHE.get(key)
+        if entry is not None and entry[0] < now:
+            del _STUDENT_CACHE[key]
+            entry = None
+        if entry is None or (max_staleness is not None and now - entry[1] > max_staleness):
+            _count_cache('student', False)
+            return None
+        _STUDENT_CACHE.move_to_end(key)
+        value = _copy_region(entry[2])
+    _count_cache('student', True)
+    return value
+
+def _student_cache_put(spreadsheet_id, sheet_name, region, value):
+    key = (spreadsheet_id, sheet_name, region)
+    with _STUDENT_CACHE_LOCK:
+        now = time.monotonic()
+        _STUDENT_CACHE[key] = (now + STUDENT_CACHE_TTLS[region], now, _copy_region(value), content_hash(value))
+        _STUDENT_CACHE.move_to_end(key)
+        while len(_STUDENT_CACHE) > STUDENT_CACHE_MAX_ENTRIES:
+            _STUDENT_CACHE.popitem(last=False)
+
+def _update_cached_task_status(spreadsheet_id, sheet_name, row_index, status):
+    with _STUDENT_CACHE_LOCK:
+        entry = _STUDENT_CACHE.get((spreadsheet_id, sheet_name, 'tasks'))
+        if entry is None:
+            return
+        for task in entry[2]:
+            if task['id'] == row_index:
+                task['status'] = status
+        _STUDENT_CACHE[(spreadsheet_id, sheet_name, 'tasks')] = entry[:3] + (content_hash(entry[2]),)
+
+def _student_cache_etag(spreadsheet_id, sheet_name, region):
+    _apply_remote_invalidations()
+    key = (spreadsheet_id, sheet_name, region)
+    with _STUDENT_CACHE_LOCK:
+        entry = _STUDENT_CACHE.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[3]
+
+def invalidate_student_cache(spreadsheet_id=None, sheet_name=None):
+    """
+    Drops cached regions for one tab, or everything if no tab is given.
+    """
+    _drop_student_cache(spreadsheet_id, sheet_name)
+    _publish_invalidation('student', json.dumps([spreadsheet_id, sheet_name]) if spreadsheet_id else None)
+
+def _drop_student_cache(spreadsheet_id=None, sheet_name=None):
+    with _STUDENT_CACHE_LOCK:
+        if spreadsheet_id is None:
+            _STUDENT_CACHE.clear()
+            return
+        for key in [k for k in _STUDENT_CACHE if k[0] == spreadsheet_id and (sheet_name is None or k[1] == sheet_name)]:
+            del _STUDENT_CACHE[key]
+
+def _read_student_regions(service, spreadsheet_id, sheet_name, regions, max_staleness=None):
+    """
+    Returns {region: parsed value} for the given regions of one student tab.
+    Cached regions are served from memory; the rest are read with one values.batchGet.
+    """
+    result, missing = _cached_student_regions(spreadsheet_id, sheet_name, regions, max_staleness)
+    if missing:
+        ranges = [_tab_range(sheet_name, STUDENT_REGIONS[region][0]) for region in missing]
+        rows_per_range = _batch_get_values(service, spreadsheet_id, ranges, max_staleness)
+        result.update(_store_student_regions(spreadsheet_id, sheet_name, missing, rows_per_range))
+    return result
+
+def _cached_student_regions(spreadsheet_id, sheet_name, regions, max_staleness=None):
+    # Returns ({region: cached value}, [regions that need reading])
+    result = {}
+    missing = []
+    for region in regions:
+        value = _student_cache_get(spreadsheet_id, sheet_name, region, max_staleness)
+        if value is None:
+            missing.append(region)
+        else:
+            result[region] = value
+    return result, missing
+
+def _store_student_regions(spreadsheet_id, sheet_name, regions, rows_per_range):
+    # Parses freshly read rows, caches them and returns {region: value}
+    result = {}
+    for region, rows in zip(regions, rows_per_range):
+        value = STUDENT_REGIONS[region][1](rows)
+        _student_cache_put(spreadsheet_id, sheet_name, region, value)
+        result[region] = value
+    return result
+
+# --- Shared View Cache ---
+# Finished results of the admin JSON APIs, stored with their content hash so a
+# conditional GET can be answered from the hash alone. Writes made through this
+# module invalidate the matching view; edits made directly in the spreadsheet
+# show up once the entry expires.
+
+VIEW_CACHE_TTLS = {
+    'schedules': float(os.environ.get('SCHEDULES_CACHE_TTL_SECONDS', '30')),
+}
+
+_VIEW_CACHE = {}  # view -> (expiry, stored_at, value, etag)
+_VIEW_CACHE_LOCK = threading.Lock()
+
+def _view_cache_get(view, max_staleness=None):
+    _apply_remote_invalidations()
+    now = time.monotonic()
+    with _VIEW_CACHE_LOCK:
+        entry = _VIEW_CACHE.get(view)
+        if entry is None or entry[0] < now or (max_staleness is not None and now - entry[1] > max_staleness):
+            entry = None
+        value = copy.deepcopy(entry[2]) if entry is not None else None
+    _count_cache('view', entry is not None)
+    return value
+
+def _view_cache_put(view, value):
+    with _VIEW_CACHE_LOCK:
+        now = time.monotonic()
+        _VIEW_CACHE[view] = (now + VIEW_CACHE_TTLS[view], now, copy.deepcopy(value), content_hash(value))
+
+def peek_view_etag(view):
+    """
+    Returns the ETag of a cached view (e.g. 'schedules'), or None if it is
+    not cached. Never calls Sheets.
+    """
+    _apply_remote_invalidations()
+    with _VIEW_CACHE_LOCK:
+        entry = _VIEW_CACHE.get(view)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[3]
+
+def invalidate_view(view=None):
+    _drop_view(view)
+    _publish_invalidation('view', view)
+
+def _drop_view(view=None):
+    with _VIEW_CACHE_LOCK:
+        if view is None:
+            _VIEW_CACHE.clear()
+        else:
+            _VIEW_CACHE.pop(view, None)
+
+# --- Write-behind Queue for Task Status ---
+# With TASK_WRITE_BEHIND enabled, update_task_status() acknowledges immediately.
+# The write is journaled to a local file and coalesced with later writes to the
+# same cell. A background thread sends everything pending for a spreadsheet as
+# one values.batchUpdate every TASK_WRITE_FLUSH_INTERVAL_MS. Journals left by a
+# worker that died are replayed by the next worker that starts the queue.
+# Writes Sheets rejects outright (e.g. a 400 for a renamed or deleted tab), or
+# that keep failing for TASK_WRITE_MAX_ATTEMPTS flushes, are dropped from the
+# queue and appended to dead_letter.jsonl in the journal directory.
+
+TASK_WRITE_BEHIND = os.environ.get('TASK_WRITE_BEHIND', '').lower() in ('1', 'true', 'yes')
+TASK_WRITE_FLUSH_INTERVAL = float(os.environ.get('TASK_WRITE_FLUSH_INTERVAL_MS', '300')) / 1000
+TASK_WRITE_JOURNAL_DIR = os.environ.get('TASK_WRITE_JOURNAL_DIR', 'task_write_journal')
+TASK_WRITE_MAX_ATTEMPTS = int(os.environ.get('TASK_WRITE_MAX_ATTEMPTS', '10'))
+
+TASK_WRITES_DROPPED = telemetry.counter(
+    'task_writes_dropped_total', 'Queued task status writes given up on and dead-lettered.', ['reason']
+)
+
+_PENDING_WRITES = {}  # spreadsheet_id -> {(sheet_name, row_index): status}
+_WRITE_ATTEMPTS = {}  # (spreadsheet_id, sheet_name, row_index) -> failed flushes so far
+_PENDING_LOCK = threading.Lock()
+_FLUSH_LOCK = threading.Lock()
+
+def _journal_path(pid=None):
+    return os.path.join(TASK_WRITE_JOURNAL_DIR, f"{pid or os.getpid()}.jsonl")
+
+def _journal_entry(spreadsheet_id, sheet_name, row_index, status):
+    return json.dumps({'spreadsheet_id': spreadsheet_id, 'sheet_name': sheet_name,
+                       'row': row_index, 'status': status}, ensure_ascii=False) + "\n"
+
+def _rewrite_journal():
+    # Caller holds _PENDING_LOCK. Compacts the journal down to what is still pending.
+    path = _journal_path()
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        for spreadsheet_id, writes in _PENDING_WRITES.items():
+            for (sheet_name, row_index), status in writes.items():
+                f.write(_journal_entry(spreadsheet_id, sheet_name, row_index, status))
+    os.replace(tmp_path, path)
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _recover_task_write_journals():
+    """
+    Loads journals of dead workers into this worker's queue. Runs before this
+    process journals anything, so a file with its own PID was left by an
+    earlier process that had the same PID (e.g. before a container restart).
+    """
+    recovered = 0
+    for filename in os.listdir(TASK_WRITE_JOURNAL_DIR):
+        if not filename.endswith('.jsonl'):
+            continue
+        try:
+            pid = int(filename[:-len('.jsonl')])
+        except ValueError:
+            continue
+        if pid != os.getpid() and _process_alive(pid):
+            continue
+
+        # Claim the file first so two starting workers don't both replay it
+        claimed = os.path.join(TASK_WRITE_JOURNAL_DIR, f"{filename}.claimed-{os.getpid()}")
+        try:
+            os.rename(os.path.join(TASK_WRITE_JOURNAL_DIR, filename), claimed)
+        except OSError:
+            continue
+
+        with open(claimed, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue # torn last line
+                with _PENDING_LOCK:
+                    writes = _PENDING_WRITES.setdefault(entry['spreadsheet_id'], {})
+                    writes.setdefault((entry['sheet_name'], entry['row']), entry['status'])
+                recovered += 1
+        os.remove(claimed)
+
+    if recovered:
+        print(f"Recovered {recovered} journaled task updates.")
+        with _PENDING_LOCK:
+            _rewrite_journal()
+
+def _start_task_write_flusher():
+    def run():
+        while True:
+            time.sleep(TASK_WRITE_FLUSH_INTERVAL)
+            flush_task_writes()
+
+    if start_once('task-write-flusher', run):
+        os.makedirs(TASK_WRITE_JOURNAL_DIR, exist_ok=True)
+        _recover_task_write_journals()
+        atexit.register(flush_task_writes)
+
+def _enqueue_task_write(spreadsheet_id, sheet_name, row_index, status):
+    _start_task_write_flusher()
+    with _PENDING_LOCK:
+        _PENDING_WRITES.setdefault(spreadsheet_id, {})[(sheet_name, row_index)] = status
+        with open(_journal_path(), 'a', encoding='utf-8') as f:
+            f.write(_journal_entry(spreadsheet_id, sheet_name, row_index, status))
+
+@_instrumented
+def flush_task_writes():
+    """
+    Sends all pending task status writes, one values.batchUpdate per spreadsheet.
+    Failed writes stay queued unless a newer write to the same cell arrived
+    meanwhile, the error is permanent, or they have run out of attempts.
+    """
+    with _FLUSH_LOCK:
+        with _PENDING_LOCK:
+            if not _PENDING_WRITES:
+                return
+            batch = dict(_PENDING_WRITES)
+            _PENDING_WRITES.clear()
+
+        service = get_service()
+        failures = []  # (spreadsheet_id, writes, error)
+        for spreadsheet_id, writes in batch.items():
+            try:
+                _send_task_writes(service, spreadsheet_id, writes)
+                continue
+            except Exception as e:
+                error = e
+
+            by_tab = {}
+            for (sheet_name, row_index), status in writes.items():
+                by_tab.setdefault(sheet_name, {})[(sheet_name, row_index)] = status
+            if not _is_permanent_error(error) or len(by_tab) == 1:
+                failures.append((spreadsheet_id, writes, error))
+                continue
+            # One bad range fails the whole batchUpdate; retry tab by tab so
+            # that the other tabs' writes still go through
+            for tab_writes in by_tab.values():
+                try:
+                    _send_task_writes(service, spreadsheet_id, tab_writes)
+                except Exception as e:
+                    failures.append((spreadsheet_id, tab_writes, e))
+
+        dropped = []  # (spreadsheet_id, writes, reason, error)
+        with _PENDING_LOCK:
+            failed_keys = set()
+            for spreadsheet_id, writes, error in failures:
+                print(f"Error flushing {len(writes)} task updates: {error}")
+                if _is_permanent_error(error):
+                    dropped.append((spreadsheet_id, writes, 'rejected', error))
+                    continue
+                pending = _PENDING_WRITES.setdefault(spreadsheet_id, {})
+                exhausted = {}
+                for cell, status in writes.items():
+                    if cell in pending:
+                        continue # superseded by a newer write, which starts afresh
+                    key = (spreadsheet_id,) + cell
+                    attempts = _WRITE_ATTEMPTS.get(key, 0) + 1
+                    if attempts >= TASK_WRITE_MAX_ATTEMPTS:
+                        exhausted[cell] = status
+                    else:
+                        pending[cell] = status
+                        _WRITE_ATTEMPTS[key] = attempts
+                        failed_keys.add(key)
+                if exhausted:
+                    dropped.append((spreadsheet_id, exhausted, 'attempts', error))
+                if not pending:
+                    del _PENDING_WRITES[spreadsheet_id]
+            # Sent, dropped or superseded: only cells still failing keep a count
+            for key in list(_WRITE_ATTEMPTS):
+                if key not in failed_keys:
+                    del _WRITE_ATTEMPTS[key]
+            _rewrite_journal()
+
+        for spreadsheet_id, writes, reason, error in dropped:
+            _dead_letter(spreadsheet_id, writes, reason, error)
+
+def _send_task_writes(service, spreadsheet_id, writes):
+    if not service:
+        raise RuntimeError("Sheets service unavailable")
+    data = [{'range': _tab_range(sheet_name, f"D{row_index}"), 'values': [[status]]}
+            for (sheet_name, row_index), status in writes.items()]
+    _execute(service.spreadsheets().values().batchUpdate(
+        spreadsheetId=spreadsheet_id,
+        body={'valueInputOption': 'USER_ENTERED', 'data': data}
+    ))
+    _invalidate_replica(spreadsheet_id, sorted({_tab_range(sheet_name, TASKS_CELLS) for sheet_name, _ in writes}))
+    # Other workers only see queued statuses once they are in the sheet
+    for sheet_name in sorted({sheet_name for sheet_name, _ in writes}):
+        _publish_invalidation('student', json.dumps([spreadsheet_id, sheet_name]))
+
+def _is_permanent_error(error):
+    # An HTTP error _execute would not retry; anything else may still succeed later
+    status = _http_status(error)
+    return status is not None and status not in RETRYABLE_STATUSES
+
+def _dead_letter(spreadsheet_id, writes, reason, error):
+    """
+    Gives up on queued writes: logs them to dead_letter.jsonl for a manual
+    replay and drops the cached statuses that showed them as saved.
+    """
+    print(f"Dropping {len(writes)} task updates for {spreadsheet_id} ({reason}): {error}")
+    TASK_WRITES_DROPPED.inc(reason, amount=len(writes))
+    try:
+        with open(os.path.join(TASK_WRITE_JOURNAL_DIR, 'dead_letter.jsonl'), 'a', encoding='utf-8') as f:
+            for (sheet_name, row_index), status in writes.items():
+                entry = json.loads(_journal_entry(spreadsheet_id, sheet_name, row_index, status))
+                entry.update({'reason': reason, 'error': str(error), 'dropped_at': time.time()})
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    except Exception as e:
+        print(f"Error writing the task update dead letter: {e}")
+    for sheet_name in sorted({sheet_name for sheet_name, _ in writes}):
+        invalidate_student_cache(spreadsheet_id, sheet_name)
+
+def _apply_pending_writes(spreadsheet_id, sheet_name, tasks):
+    """
+    Overlays queued (not yet flushed) statuses onto tasks read from the sheet.
+    """
+    with _PENDING_LOCK:
+        writes = _PENDING_WRITES.get(spreadsheet_id)
+        if not writes:
+            return tasks
+        for task in tasks:
+            status = writes.get((sheet_name, task['id']))
+            if status is not None:
+                task['status'] = status
+    return tasks
+
+@_instrumented
+def get_tasks(student_id, max_staleness=None):
     service = get_service()
     if not service:
         return []
@@ -80,70 +1445,99 @@ def get_tasks(student_id):
     target_sheet_name = config['sheet_name']
 
     try:
-        sheet = service.spreadsheets()
-        # Use dynamic sheet name
         # Note: If sheet name contains spaces/special chars, API handles it usually, 
         # but quoting 'Sheet Name'!A1 is safer if we control the string. 
         # However, purely relying on the string from Master sheet is most flexible.
-        range_name = f"'{target_sheet_name}'!A6:E" 
-        result = sheet.values().get(spreadsheetId=target_spreadsheet_id, range=range_name).execute()
-        rows = result.get('values', [])
-        
-        tasks = []
-        current_week = ""
-        
-        for i, row in enumerate(rows):
-            sheet_row_index = 6 + i
-            col_a = row[0] if len(row) > 0 else ""
-            col_b = row[1] if len(row) > 1 else ""
-            col_c = row[2] if len(row) > 2 else ""
-            col_d = row[3] if len(row) > 3 else "未着手"
-            
-            if col_a.strip().startswith("Week"):
-                current_week = col_a.strip()
-            
-            title = col_b.strip()
-            if title:
-                tasks.append({
-                    "id": sheet_row_index,
-                    "title": title,
-                    "description": col_c,
-                    "status": col_d,
-                    "week": current_week
-                })
-        return tasks
+        regions = _read_student_regions(service, target_spreadsheet_id, target_sheet_name, ['tasks'], max_staleness)
+        return _apply_pending_writes(target_spreadsheet_id, target_sheet_name, regions['tasks'])
     except Exception as e:
         print(f"Error fetching tasks: {e}")
         return []
 
+@_instrumented
 def update_task_status(student_id, task_id, status):
-    service = get_service()
-    if not service:
-        return False
+    results = update_task_statuses(student_id, [{'task_id': task_id, 'status': status}])
+    return results[0]['status'] == 'success'
+
+@_instrumented
+def update_task_statuses(student_id, updates):
+    """
+    Sets the status of several tasks on a student's tab with one
+    values.batchUpdate; consecutive rows share a single D-column range.
+    updates: list of {'task_id': int, 'status': str}.
+    Returns one {'task_id', 'status', 'message'?} per item, in order. status is
+    'success', 'invalid' (not sent) or 'error'.
+    """
+    results = []
+    accepted = {}  # row_index -> task status
+    for item in updates:
+        item = item if isinstance(item, dict) else {}
+        task_id = item.get('task_id')
+        status = item.get('status')
+        result = {'task_id': task_id}
+        results.append(result)
+        try:
+            row_index = int(task_id)
+        except (TypeError, ValueError):
+            row_index = None
+        if row_index is None or row_index < TASKS_FIRST_ROW:
+            result.update({'status': 'invalid', 'message': 'Invalid task_id'})
+        elif not isinstance(status, str) or not status:
+            result.update({'status': 'invalid', 'message': 'Missing status'})
+        elif row_index in accepted:
+            result.update({'status': 'invalid', 'message': 'Duplicate task_id'})
+        else:
+            result['task_id'] = row_index
+            accepted[row_index] = status
+
+    def finish(outcome, message=None):
+        for result in results:
+            if 'status' not in result:
+                result['status'] = outcome
+                if message:
+                    result['message'] = message
+        return results
 
+    if not accepted:
+        return results
+
+    service = get_service()
     config = get_student_config(student_id)
-    if not config:
-        return False
+    if not service or not config:
+        return finish('error', 'Failed to update')
 
     target_spreadsheet_id = config['spreadsheet_id']
     target_sheet_name = config['sheet_name']
 
     try:
-        row_index = int(task_id)
-        range_name = f"'{target_sheet_name}'!D{row_index}"
-        body = {'values': [[status]]}
-        service.spreadsheets().values().update(
-            spreadsheetId=target_spreadsheet_id, 
-            range=range_name, 
-            valueInputOption='USER_ENTERED', 
-            body=body
-        ).execute()
-        return True
+        if TASK_WRITE_BEHIND:
+            for row_index, status in accepted.items():
+                _enqueue_task_write(target_spreadsheet_id, target_sheet_name, row_index, status)
+                _update_cached_task_status(target_spreadsheet_id, target_sheet_name, row_index, status)
+            return finish('success')
+
+        data = [{
+            'range': _tab_range(target_sheet_name, f"D{first}:D{last}"),
+            'values': [[accepted[row_index]] for row_index in range(first, last + 1)]
+        } for first, last in _row_spans(accepted)]
+        _execute(service.spreadsheets().values().batchUpdate(
+            spreadsheetId=target_spreadsheet_id,
+            body={'valueInputOption': 'USER_ENTERED', 'data': data}
+        ))
+        # Let the student see their own write without re-reading the tab
+        for row_index, status in accepted.items():
+            _update_cached_task_status(target_spreadsheet_id, target_sheet_name, row_index, status)
+        _invalidate_replica(target_spreadsheet_id, [_tab_range(target_sheet_name, TASKS_CELLS)])
+        _publish_invalidation('student', json.dumps([target_spreadsheet_id, target_sheet_name]))
+        # No refresh_dashboard_metrics(): the snapshot holds sales and each
+        # student's week, neither of which a task status changes
+        return finish('success')
     except Exception as e:
-        print(f"Error updating task: {e}")
-        return False
+        print(f"Error updating {len(accepted)} tasks: {e}")
+        return finish('error', 'Failed to update')
 
-def get_user_info(student_id):
+@_instrumented
+def get_user_info(student_id, max_staleness=None):
     service = get_service()
     if not service:
         return {}
@@ -156,34 +1550,73 @@ def get_user_info(student_id):
     target_sheet_name = config['sheet_name']
 
     try:
-        result = service.spreadsheets().values().get(spreadsheetId=target_spreadsheet_id, range=f"'{target_sheet_name}'!A1:F5").execute()
-        rows = result.get('values', [])
-        
-        info = {
-            "monthly_goal": "",
-            "bottleneck": "",
-            "weekly_focus": "",
-            "current_week": "",
-            "mentor": ""
-        }
-
-        if len(rows) > 1:
-            row2 = rows[1]
-            if len(row2) > 0: info["monthly_goal"] = row2[0]
-            if len(row2) > 2: info["bottleneck"] = row2[2]
-            
-        if len(rows) > 3:
-            row4 = rows[3]
-            if len(row4) > 0: info["weekly_focus"] = row4[0]
-            if len(row4) > 3: info["current_week"] = row4[3]
-            if len(row4) > 4: info["mentor"] = row4[4]
-            
-        return info
+        regions = _read_student_regions(service, target_spreadsheet_id, target_sheet_name, ['user_info'], max_staleness)
+        return regions['user_info']
 
     except Exception as e:
         print(f"Error fetching user info: {e}")
         return {}
 
+@_instrumented
+def get_student_dashboard(student_id, max_staleness=None):
+    """
+    Fetches everything the student dashboard needs (tasks and user info)
+    with a single values.batchGet against the student's tab.
+    Returns a dict: {'tasks': list, 'user_info': dict, 'etag': str or None}
+    """
+    empty = {'tasks': [], 'user_info': {}, 'etag': None}
+    service = get_service()
+    if not service:
+        return empty
+
+    config = get_student_config(student_id)
+    if not config:
+        print(f"No config found for {student_id}")
+        return empty
+    note_student_active(student_id)
+
+    target_spreadsheet_id = config['spreadsheet_id']
+    target_sheet_name = config['sheet_name']
+
+    try:
+        regions = _read_student_regions(service, target_spreadsheet_id, target_sheet_name, ['user_info', 'tasks'], max_staleness)
+        return _dashboard_payload(target_spreadsheet_id, target_sheet_name, regions)
+    except Exception as e:
+        print(f"Error fetching student dashboard: {e}")
+        return empty
+
+def _dashboard_payload(spreadsheet_id, sheet_name, regions):
+    tasks = _apply_pending_writes(spreadsheet_id, sheet_name, regions['tasks'])
+    return {
+        'tasks': tasks,
+        'user_info': regions['user_info'],
+        'etag': content_hash([content_hash(regions['user_info']), content_hash(tasks)])
+    }
+
+@_instrumented
+def peek_student_dashboard_etag(student_id):
+    """
+    Returns the ETag get_student_dashboard() would report, using only the
+    hashes kept in the read cache. Returns None (without calling Sheets)
+    when either region is not cached or queued writes would change it.
+    """
+    config = get_student_config(student_id)
+    if not config:
+        return None
+    spreadsheet_id, sheet_name = config['spreadsheet_id'], config['sheet_name']
+
+    with _PENDING_LOCK:
+        writes = _PENDING_WRITES.get(spreadsheet_id) or {}
+        if any(name == sheet_name for name, _ in writes):
+            return None
+
+    user_info_etag = _student_cache_etag(spreadsheet_id, sheet_name, 'user_info')
+    tasks_etag = _student_cache_etag(spreadsheet_id, sheet_name, 'tasks')
+    if user_info_etag is None or tasks_etag is None:
+        return None
+    return content_hash([user_info_etag, tasks_etag])
+
+@_instrumented
 def submit_question(student_id, question_text):
     service = get_service()
     if not service:
@@ -198,61 +1631,104 @@ def submit_question(student_id, question_text):
         values = [[timestamp, student_id, question_text, status, ""]]
         body = {'values': values}
         
-        service.spreadsheets().values().append(
+        result = _execute(service.spreadsheets().values().append(
             spreadsheetId=SPREADSHEET_ID,
             range='質問!A:E',
             valueInputOption='USER_ENTERED',
             insertDataOption='INSERT_ROWS',
             body=body
-        ).execute()
+        ))
+        _note_question_submitted(result.get('updates', {}).get('updatedRange'), values[0])
+        _publish_invalidation('question_submitted')
         return True
     except Exception as e:
         print(f"Error submitting question: {e}")
         return False
 
+@_instrumented
 def reply_to_question(row_index, reply_text):
     """
     Updates the question row with the reply and changes status to '回答済み'.
     """
-    service = get_service()
-    if not service: return False
+    results = reply_to_questions([{'row_index': row_index, 'reply_text': reply_text}])
+    return results[0]['status'] == 'success'
+
+@_instrumented
+def reply_to_questions(replies):
+    """
+    Answers several questions with a single values.batchUpdate.
+    replies: list of {'row_index': int, 'reply_text': str}.
+    Returns one {'row_index', 'status', 'message'?} per item, in order. status is
+    'success', 'invalid' (not sent) or 'error' (the batch update failed, which
+    fails every item that was sent).
+    """
+    results = []
+    data = []
+    seen_rows = set()
+    for item in replies:
+        item = item if isinstance(item, dict) else {}
+        row_index = item.get('row_index')
+        reply_text = item.get('reply_text')
+        result = {'row_index': row_index}
+        results.append(result)
+        try:
+            row_index = int(row_index)
+        except (TypeError, ValueError):
+            row_index = None
+        if row_index is None or row_index < QUESTIONS_FIRST_ROW:
+            result.update({'status': 'invalid', 'message': 'Invalid row_index'})
+        elif not reply_text:
+            result.update({'status': 'invalid', 'message': 'Missing reply_text'})
+        elif row_index in seen_rows:
+            result.update({'status': 'invalid', 'message': 'Duplicate row_index'})
+        else:
+            seen_rows.add(row_index)
+            result['row_index'] = row_index
+            # Columns correspond to: A:Timestamp, B:StudentId, C:Question, D:Status, E:Reply
+            data.append({'range': f"質問!D{row_index}:E{row_index}", 'values': [["回答済み", reply_text]]})
 
+    if not data:
+        return results
+
+    service = get_service()
     try:
-        # Columns correspond to: A:Timestamp, B:StudentId, C:Question, D:Status, E:Reply
-        # We need to update D (Status) and E (Reply).
-        # row_index is 1-based.
-        range_name = f"質問!D{row_index}:E{row_index}"
-        values = [["回答済み", reply_text]]
-        body = {'values': values}
-        
-        service.spreadsheets().values().update(
+        if not service:
+            raise RuntimeError("Sheets service unavailable")
+        _execute(service.spreadsheets().values().batchUpdate(
             spreadsheetId=SPREADSHEET_ID,
-            range=range_name,
-            valueInputOption='USER_ENTERED',
-            body=body
-        ).execute()
-        return True
+            body={'valueInputOption': 'USER_ENTERED', 'data': data}
+        ))
     except Exception as e:
-        print(f"Error replying to question: {e}")
-        return False
+        print(f"Error replying to {len(data)} questions: {e}")
+        for result in results:
+            if 'status' not in result:
+                result.update({'status': 'error', 'message': 'Failed to submit reply'})
+        return results
 
-    except Exception as e:
-        print(f"Error replying to question: {e}")
-        return False
+    for result in results:
+        if 'status' not in result:
+            result['status'] = 'success'
+            _note_question_answered(result['row_index'])
+            _publish_invalidation('question_answered', str(result['row_index']))
+    return results
 
 # --- Schedule Functions ---
 
-def get_schedules():
+@_instrumented
+def get_schedules(max_staleness=None):
     """
     Fetches all schedules from the 'Schedules' sheet.
     """
+    cached = _view_cache_get('schedules', max_staleness)
+    if cached is not None:
+        return cached
+
     service = get_service()
     if not service: return []
 
     try:
         # Check if 'Schedules' sheet exists, if not create it
-        spreadsheet = service.spreadsheets().get(spreadsheetId=SPREADSHEET_ID).execute()
-        sheet_exists = any(s['properties']['title'] == 'Schedules' for s in spreadsheet.get('sheets', []))
+        sheet_exists = 'Schedules' in _sheet_catalog(service)
         
         if not sheet_exists:
             # Create 'Schedules' sheet
@@ -263,19 +1739,20 @@ def get_schedules():
                     }
                 }]
             }
-            service.spreadsheets().batchUpdate(spreadsheetId=SPREADSHEET_ID, body=request_body).execute()
+            _execute(service.spreadsheets().batchUpdate(spreadsheetId=SPREADSHEET_ID, body=request_body))
+            invalidate_sheet_catalog()
             # Add Header
             header = [['ID', 'Title', 'Start', 'End', 'Type']]
-            service.spreadsheets().values().update(
+            _execute(service.spreadsheets().values().update(
                 spreadsheetId=SPREADSHEET_ID,
                 range='Schedules!A1:E1',
                 valueInputOption='USER_ENTERED',
                 body={'values': header}
-            ).execute()
+            ))
+            _invalidate_replica(SPREADSHEET_ID, [SCHEDULES_RANGE])
             return []
 
-        result = service.spreadsheets().values().get(spreadsheetId=SPREADSHEET_ID, range='Schedules!A2:E').execute()
-        rows = result.get('values', [])
+        rows = _batch_get_values(service, SPREADSHEET_ID, [SCHEDULES_RANGE], max_staleness)[0]
         
         schedules = []
         for i, row in enumerate(rows):
@@ -288,11 +1765,13 @@ def get_schedules():
                     'type': row[4] if len(row) > 4 else "event",
                     'row_index': i + 2 # For deletion
                 })
+        _view_cache_put('schedules', schedules)
         return schedules
     except Exception as e:
         print(f"Error fetching schedules: {e}")
         return []
 
+@_instrumented
 def add_schedule(title, start, end, event_type="event"):
     service = get_service()
     if not service: return False
@@ -304,25 +1783,28 @@ def add_schedule(title, start, end, event_type="event"):
         values = [[event_id, title, start, end, event_type]]
         body = {'values': values}
         
-        service.spreadsheets().values().append(
+        _execute(service.spreadsheets().values().append(
             spreadsheetId=SPREADSHEET_ID,
             range='Schedules!A:E',
             valueInputOption='USER_ENTERED',
             insertDataOption='INSERT_ROWS',
             body=body
-        ).execute()
+        ))
+        _invalidate_replica(SPREADSHEET_ID, [SCHEDULES_RANGE])
+        invalidate_view('schedules')
         return True
     except Exception as e:
         print(f"Error adding schedule: {e}")
         return False
 
+@_instrumented
 def delete_schedule(event_id):
     service = get_service()
     if not service: return False
 
     try:
-        # Find row index
-        schedules = get_schedules()
+        # Find row index (from Sheets itself: a stale row index would delete the wrong row)
+        schedules = get_schedules(max_staleness=0)
         row_index = -1
         for s in schedules:
             if s['id'] == event_id:
@@ -332,12 +1814,8 @@ def delete_schedule(event_id):
         if row_index == -1: return False
         
         # Delete row
-        spreadsheet = service.spreadsheets().get(spreadsheetId=SPREADSHEET_ID).execute()
-        sheet_id = 0
-        for s in spreadsheet.get('sheets', []):
-            if s['properties']['title'] == 'Schedules':
-                sheet_id = s['properties']['sheetId']
-                break
+        schedules_sheet = _sheet_catalog(service).get('Schedules')
+        sheet_id = schedules_sheet['sheet_id'] if schedules_sheet else 0
                 
         request_body = {
             'requests': [{
@@ -351,7 +1829,9 @@ def delete_schedule(event_id):
                 }
             }]
         }
-        service.spreadsheets().batchUpdate(spreadsheetId=SPREADSHEET_ID, body=request_body).execute()
+        _execute(service.spreadsheets().batchUpdate(spreadsheetId=SPREADSHEET_ID, body=request_body))
+        _invalidate_replica(SPREADSHEET_ID, [SCHEDULES_RANGE])
+        invalidate_view('schedules')
         return True
     except Exception as e:
         print(f"Error deleting schedule: {e}")
@@ -361,359 +1841,1104 @@ def delete_schedule(event_id):
         print(f"Error deleting schedule: {e}")
         return False
 
-# --- Dashboard Metrics ---
+# --- Dashboard Metrics ---
+# The charts on the admin dashboard are served from a materialized snapshot.
+# A background thread recomputes it every DASHBOARD_METRICS_REFRESH_SECONDS,
+# and shortly after writes that can move the numbers (batched by the debounce
+# delay), so requests never wait on Sheets once the first snapshot exists.
+
+METRICS_REFRESH_INTERVAL = float(os.environ.get('DASHBOARD_METRICS_REFRESH_SECONDS', '300'))
+METRICS_REFRESH_DEBOUNCE = float(os.environ.get('DASHBOARD_METRICS_DEBOUNCE_SECONDS', '5'))
+UNSTARTED_LABEL = 'Unstarted'
+
+_METRICS_SNAPSHOT = None  # {'metrics': dict, 'weeks': {student_id: label}, 'generated_at': epoch seconds, 'etag': str}
+_METRICS_LOCK = threading.Lock()
+_METRICS_DIRTY = threading.Event()
+
+def _read_sales(service):
+    # Check if 'Sales' sheet exists, if not create it with dummy data
+    if 'Sales' not in _sheet_catalog(service):
+        request_body = {
+            'requests': [{
+                'addSheet': {
+                    'properties': {'title': 'Sales'}
+                }
+            }]
+        }
+        _execute(service.spreadsheets().batchUpdate(spreadsheetId=SPREADSHEET_ID, body=request_body))
+        invalidate_sheet_catalog()
+        # Add Header and Dummy Data
+        header = [['Month', 'Revenue', 'Target']]
+        dummy_data = [
+            ['2025-01', '500000', '600000'],
+            ['2025-02', '550000', '600000'],
+            ['2025-03', '600000', '650000'],
+            ['2025-04', '580000', '650000'],
+            ['2025-05', '620000', '700000']
+        ]
+        _execute(service.spreadsheets().values().update(
+            spreadsheetId=SPREADSHEET_ID,
+            range='Sales!A1:C6',
+            valueInputOption='USER_ENTERED',
+            body={'values': header + dummy_data}
+        ))
+        _invalidate_replica(SPREADSHEET_ID, [SALES_RANGE])
+        return [{'month': r[0], 'revenue': int(r[1]), 'target': int(r[2])} for r in dummy_data]
+
+    sales_data = []
+    rows = _batch_get_values(service, SPREADSHEET_ID, [SALES_RANGE])[0]
+    for row in rows:
+        if len(row) >= 3:
+            # Clean up values (remove currency symbols, commas)
+            rev = row[1].replace(',', '').replace('¥', '')
+            tgt = row[2].replace(',', '').replace('¥', '')
+            sales_data.append({
+                'month': row[0],
+                'revenue': int(rev) if rev.isdigit() else 0,
+                'target': int(tgt) if tgt.isdigit() else 0
+            })
+    return sales_data
+
+def _week_sort_key(label):
+    # Unstarted first, then Week 1, 2, ... 10 in numeric order, then anything else
+    if label == UNSTARTED_LABEL:
+        return (0, 0, label)
+    match = re.search(r'(\d+)', label)
+    if match:
+        return (1, int(match.group(1)), label)
+    return (2, 0, label)
+
+def _week_label(summary):
+    week = (summary.get('current_week') or '').strip()
+    return UNSTARTED_LABEL if week in ('', 'N/A', '-') else week
+
+def _week_distribution(summaries):
+    progress_counts = {}
+    for summary in summaries:
+        if summary.get('error'):
+            continue
+        key = _week_label(summary)
+        progress_counts[key] = progress_counts.get(key, 0) + 1
+
+    sorted_keys = sorted(progress_counts, key=_week_sort_key)
+    return {
+        'labels': sorted_keys,
+        'counts': [progress_counts[k] for k in sorted_keys]
+    }
+
+@_instrumented
+def compute_dashboard_metrics(max_staleness=None):
+    """
+    Rebuilds the metrics snapshot (sales series and the per-student week
+    distribution) and returns it. Raises if Sheets can't be read.
+    """
+    global _METRICS_SNAPSHOT
+    service = get_service()
+    if not service:
+        raise RuntimeError("Sheets service unavailable")
+
+    with _METRICS_LOCK, sheets_priority(PRIORITY_BULK):
+        started_at = time.time()
+        summaries = get_student_summaries(max_staleness=max_staleness)
+        metrics = {
+            'sales': _read_sales(service),
+            'progress': _week_distribution(summaries)
+        }
+        _METRICS_SNAPSHOT = {
+            'metrics': metrics,
+            # Lets the student list filter and sort by week without reading every tab
+            'weeks': {s['student_id']: _week_label(s) for s in summaries if not s.get('error')},
+            'generated_at': started_at,
+            'etag': content_hash(metrics)
+        }
+        return copy.deepcopy(_METRICS_SNAPSHOT)
+
+def _start_metrics_worker():
+    def run():
+        while True:
+            if _METRICS_DIRTY.wait(timeout=METRICS_REFRESH_INTERVAL):
+                # Let a burst of writes settle before re-reading everything
+                time.sleep(METRICS_REFRESH_DEBOUNCE)
+                _METRICS_DIRTY.clear()
+                max_staleness = None
+            else:
+                max_staleness = METRICS_REFRESH_INTERVAL
+            try:
+                compute_dashboard_metrics(max_staleness)
+            except Exception as e:
+                print(f"Error refreshing dashboard metrics: {e}")
+
+    start_once('dashboard-metrics', run)
+
+def refresh_dashboard_metrics():
+    """
+    Asks the background worker to recompute the snapshot soon. Called after
+    writes that change what it counts (the roster); a no-op until the metrics
+    have been requested in this process.
+    """
+    _mark_metrics_dirty()
+    _publish_invalidation('metrics')
+
+def _mark_metrics_dirty():
+    if _METRICS_SNAPSHOT is not None:
+        _METRICS_DIRTY.set()
+
+@_instrumented
+def get_dashboard_metrics_snapshot():
+    """
+    Returns the current snapshot: {'metrics', 'weeks', 'generated_at', 'etag'}.
+    Only the very first call in a process computes it inline.
+    Returns None if it has never been computed successfully.
+    """
+    _apply_remote_invalidations()
+    _start_metrics_worker()
+    snapshot = _METRICS_SNAPSHOT
+    if snapshot is None:
+        try:
+            snapshot = compute_dashboard_metrics()
+        except Exception as e:
+            print(f"Error getting dashboard metrics: {e}")
+            return None
+    return copy.deepcopy(snapshot)
+
+def peek_dashboard_metrics_etag():
+    snapshot = _METRICS_SNAPSHOT
+    return snapshot['etag'] if snapshot else None
 
+@_instrumented
 def get_dashboard_metrics():
     """
     Fetches Sales data and aggregates Student Goals data.
     """
-    service = get_service()
-    if not service: return {}
+    snapshot = get_dashboard_metrics_snapshot()
+    return snapshot['metrics'] if snapshot else {}
 
-    try:
-        # 1. Sales Data
-        # Check if 'Sales' sheet exists, if not create it with dummy data
-        spreadsheet = service.spreadsheets().get(spreadsheetId=SPREADSHEET_ID).execute()
-        sheet_exists = any(s['properties']['title'] == 'Sales' for s in spreadsheet.get('sheets', []))
-        
-        sales_data = []
-        if not sheet_exists:
-            # Create 'Sales' sheet
-            request_body = {
-                'requests': [{
-                    'addSheet': {
-                        'properties': {'title': 'Sales'}
-                    }
-                }]
-            }
-            service.spreadsheets().batchUpdate(spreadsheetId=SPREADSHEET_ID, body=request_body).execute()
-            # Add Header and Dummy Data
-            header = [['Month', 'Revenue', 'Target']]
-            dummy_data = [
-                ['2025-01', '500000', '600000'],
-                ['2025-02', '550000', '600000'],
-                ['2025-03', '600000', '650000'],
-                ['2025-04', '580000', '650000'],
-                ['2025-05', '620000', '700000']
-            ]
-            service.spreadsheets().values().update(
-                spreadsheetId=SPREADSHEET_ID,
-                range='Sales!A1:C6',
-                valueInputOption='USER_ENTERED',
-                body={'values': header + dummy_data}
-            ).execute()
-            
-            # Fetch the dummy data we just added
-            sales_data = [{'month': r[0], 'revenue': int(r[1]), 'target': int(r[2])} for r in dummy_data]
-            
-        else:
-            result = service.spreadsheets().values().get(spreadsheetId=SPREADSHEET_ID, range='Sales!A2:C').execute()
-            rows = result.get('values', [])
-            for row in rows:
-                if len(row) >= 3:
-                     # Clean up values (remove currency symbols, commas)
-                    rev = row[1].replace(',', '').replace('¥', '')
-                    tgt = row[2].replace(',', '').replace('¥', '')
-                    try:
-                        sales_data.append({
-                            'month': row[0],
-                            'revenue': int(rev) if rev.isdigit() else 0,
-                            'target': int(tgt) if tgt.isdigit() else 0
-                        })
-                    except ValueError:
-                        continue
-
-        # 2. Student Progress Distribution (Goals)
-        students = get_all_students()
-        progress_counts = {}
-        
-        for s in students:
-            week = s.get('current_week', 'N/A')
-            if week == 'N/A' or week == '-':
-                key = 'Unstarted'
-            else:
-                key = week
-            
-            progress_counts[key] = progress_counts.get(key, 0) + 1
-            
-        # Sort keys to make charts look nice (Unstarted first, then Week 1, 2...)
-        sorted_keys = sorted(progress_counts.keys(), key=lambda x: int(x.split(' ')[1]) if 'Week' in x else -1 if x == 'Unstarted' else 999)
-        
-        progress_data = {
-            'labels': sorted_keys,
-            'counts': [progress_counts[k] for k in sorted_keys]
-        }
+# --- Admin Dashboard Functions ---
+
+@_instrumented
+def get_all_students(max_staleness=None):
+    """
+    Fetches all students from the Master sheet.
+    Returns a list of dicts: {'student_id': str, 'spreadsheet_id': str, 'name': str, 'sheet_name': str}
+    """
+    roster = _get_roster(max_age=max_staleness)
+    if not roster:
+        return []
+
+    # Copies, since callers decorate the dicts (e.g. get_admin_dashboard_data)
+    return [dict(s) for s in roster['students']]
+
+# --- Question Index ---
+# The 質問 sheet only ever grows, but few of its rows are open at any time.
+# The index remembers the last row it has ingested and the open questions.
+# A refresh reads the new tail plus the open rows (one values.batchGet) instead
+# of the whole sheet. Each open row is checked against what was ingested; if
+# rows moved (e.g. someone deleted rows by hand), the index is rebuilt with a
+# full read. Replies and submissions made here update it directly.
+
+QUESTION_INDEX_TTL_SECONDS = float(os.environ.get('QUESTION_INDEX_TTL_SECONDS', '15'))
+# Full re-read as a safety net for edits the incremental checks can't see
+QUESTION_INDEX_REBUILD_SECONDS = float(os.environ.get('QUESTION_INDEX_REBUILD_SECONDS', '3600'))
+QUESTIONS_FIRST_ROW = 2
 
+_QUESTION_INDEX = None  # {'last_row', 'last_key', 'open': {row_index: question}, 'refreshed_at', 'built_at'}
+_QUESTION_INDEX_LOCK = threading.Lock()
+_QUESTION_REFRESH_LOCK = threading.Lock()
+_ANSWERED_ROWS = {}  # row_index -> when it was answered through reply_to_question
+
+class _QuestionIndexDrift(Exception):
+    pass
+
+def _question_key(row):
+    # Timestamp, StudentID, Question identify a row well enough to notice shifts
+    return tuple((list(row) + ['', '', ''])[:3])
+
+def _question_from_row(row_index, row):
+    """
+    Returns the question dict for an open row, or None if it is answered (or empty).
+    """
+    if not row:
+        return None
+    # Format: Timestamp, StudentID, Question, Status, Reply
+    status = row[3] if len(row) > 3 else "未回答"
+    if status == "未回答" or not status.strip():
         return {
-            'sales': sales_data,
-            'progress': progress_data
+            'row_index': row_index,
+            'timestamp': row[0] if len(row) > 0 else "",
+            'student_id': row[1] if len(row) > 1 else "",
+            'question': row[2] if len(row) > 2 else "",
+            'status': status
         }
+    return None
 
-    except Exception as e:
-        print(f"Error getting dashboard metrics: {e}")
-        return {}
+def _build_question_index(service):
+    rows = _execute(service.spreadsheets().values().get(
+        spreadsheetId=SPREADSHEET_ID, range=QUESTIONS_RANGE
+    )).get('values', [])
+    now = time.monotonic()
+    index = {'open': {}, 'refreshed_at': now, 'built_at': now}
+    for i, row in enumerate(rows):
+        question = _question_from_row(QUESTIONS_FIRST_ROW + i, row)
+        if question:
+            index['open'][question['row_index']] = question
+    index['last_row'] = QUESTIONS_FIRST_ROW + len(rows) - 1
+    index['last_key'] = _question_key(rows[-1]) if rows else None
+    return index
 
-# --- Admin Dashboard Functions ---
+def _row_spans(row_indices):
+    # Groups sorted row numbers into contiguous (first, last) spans
+    spans = []
+    for row_index in sorted(row_indices):
+        if spans and spans[-1][1] == row_index - 1:
+            spans[-1][1] = row_index
+        else:
+            spans.append([row_index, row_index])
+    return spans
 
-def get_all_students():
+def _refresh_question_index(service, index):
     """
-    Fetches all students from the Master sheet.
-    Returns a list of dicts: {'student_id': str, 'name': str, 'sheet_name': str}
+    Returns an updated copy of index from one values.batchGet covering the
+    last ingested row onwards and the open rows.
+    Raises _QuestionIndexDrift if rows have moved since they were ingested.
     """
-    service = get_service()
-    if not service: return []
+    last_row = index['last_row']
+    # Start the tail at the last ingested row to check it is still in place
+    tail_start = max(last_row, QUESTIONS_FIRST_ROW)
+    spans = _row_spans(r for r in index['open'] if r < tail_start)
+    ranges = [f"質問!A{tail_start}:E"] + [f"質問!A{first}:E{last}" for first, last in spans]
+    result = _execute(service.spreadsheets().values().batchGet(spreadsheetId=SPREADSHEET_ID, ranges=ranges))
+    value_ranges = [vr.get('values', []) for vr in result.get('valueRanges', [])]
+    tail, span_rows = value_ranges[0], value_ranges[1:]
+
+    if last_row >= QUESTIONS_FIRST_ROW:
+        if not tail or _question_key(tail[0]) != index['last_key']:
+            raise _QuestionIndexDrift(f"row {last_row} changed")
+        tail_rows = list(enumerate(tail[1:], start=last_row + 1))
+        checked_rows = [(last_row, tail[0])]
+    else:
+        tail_rows = list(enumerate(tail, start=QUESTIONS_FIRST_ROW))
+        checked_rows = []
+
+    for (first, _), rows in zip(spans, span_rows):
+        checked_rows.extend(enumerate(rows, start=first))
+
+    open_questions = dict(index['open'])
+    for row_index, row in checked_rows:
+        previous = open_questions.get(row_index)
+        if previous is None:
+            continue
+        if _question_key(row) != (previous['timestamp'], previous['student_id'], previous['question']):
+            raise _QuestionIndexDrift(f"open row {row_index} changed")
+        if _question_from_row(row_index, row) is None:
+            del open_questions[row_index]
+    # Rows past the end of a span read came back empty, i.e. were cleared
+    for (first, last), rows in zip(spans, span_rows):
+        for row_index in range(first + len(rows), last + 1):
+            open_questions.pop(row_index, None)
+
+    for row_index, row in tail_rows:
+        question = _question_from_row(row_index, row)
+        if question:
+            open_questions[row_index] = question
+
+    refreshed = dict(index)
+    refreshed['open'] = open_questions
+    if tail_rows:
+        refreshed['last_row'] = tail_rows[-1][0]
+        refreshed['last_key'] = _question_key(tail_rows[-1][1])
+    refreshed['refreshed_at'] = time.monotonic()
+    return refreshed
+
+def _get_question_index(max_staleness=None):
+    global _QUESTION_INDEX
+    if max_staleness is None:
+        max_staleness = QUESTION_INDEX_TTL_SECONDS
+
+    _apply_remote_invalidations()
+    index = _QUESTION_INDEX
+    current = index is not None and time.monotonic() - index['refreshed_at'] <= max_staleness
+    _count_cache('question_index', current)
+    if current:
+        return index
+
+    with _QUESTION_REFRESH_LOCK:
+        # Another thread may have refreshed it while we waited
+        index = _QUESTION_INDEX
+        if index is not None and time.monotonic() - index['refreshed_at'] <= max_staleness:
+            return index
+
+        service = get_service()
+        if not service:
+            return index
+
+        started = time.monotonic()
+        if index is None or started - index['built_at'] > QUESTION_INDEX_REBUILD_SECONDS:
+            fresh = _build_question_index(service)
+        else:
+            try:
+                fresh = _refresh_question_index(service, index)
+            except _QuestionIndexDrift as e:
+                print(f"Question index out of date ({e}), rebuilding")
+                fresh = _build_question_index(service)
+
+        with _QUESTION_INDEX_LOCK:
+            # A reply made while we were reading wins over what we read
+            for row_index, answered_at in list(_ANSWERED_ROWS.items()):
+                if answered_at >= started:
+                    fresh['open'].pop(row_index, None)
+                else:
+                    del _ANSWERED_ROWS[row_index]
+            _QUESTION_INDEX = fresh
+        return fresh
+
+def _note_question_submitted(updated_range, values):
+    """
+    Adds a question we just appended to the index, if it lands right after
+    the last ingested row. Otherwise the next tail read picks it up.
+    """
+    global _QUESTION_INDEX
+    match = re.search(r'!\$?[A-Z]+\$?(\d+)', updated_range or '')
+    if not match:
+        return
+    row_index = int(match.group(1))
+    with _QUESTION_INDEX_LOCK:
+        index = _QUESTION_INDEX
+        if index is None or row_index != index['last_row'] + 1:
+            return
+        updated = dict(index)
+        updated['open'] = dict(index['open'])
+        question = _question_from_row(row_index, values)
+        if question:
+            updated['open'][row_index] = question
+        updated['last_row'] = row_index
+        updated['last_key'] = _question_key(values)
+        _QUESTION_INDEX = updated
+
+def _note_question_answered(row_index):
+    global _QUESTION_INDEX
+    with _QUESTION_INDEX_LOCK:
+        _ANSWERED_ROWS[row_index] = time.monotonic()
+        index = _QUESTION_INDEX
+        if index is None or row_index not in index['open']:
+            return
+        updated = dict(index)
+        updated['open'] = {r: q for r, q in index['open'].items() if r != row_index}
+        _QUESTION_INDEX = updated
+
+def invalidate_question_index():
+    _drop_question_index()
+    _publish_invalidation('questions')
+
+def _drop_question_index():
+    global _QUESTION_INDEX
+    with _QUESTION_INDEX_LOCK:
+        _QUESTION_INDEX = None
+
+def _expire_question_index():
+    # Another worker appended a question: read the tail on the next lookup
+    global _QUESTION_INDEX
+    with _QUESTION_INDEX_LOCK:
+        if _QUESTION_INDEX is not None:
+            _QUESTION_INDEX = dict(_QUESTION_INDEX, refreshed_at=float('-inf'))
 
+@_instrumented
+def get_unanswered_questions(max_staleness=None):
+    """
+    Fetches all questions with status '未回答' or empty status.
+    """
     try:
-        # Read Master sheet A:D
-        result = service.spreadsheets().values().get(spreadsheetId=SPREADSHEET_ID, range='Master!A2:D').execute()
-        rows = result.get('values', [])
-        
-        students = []
-        for row in rows:
-            if len(row) >= 3: # Must have ID, SpreadsheetID, Name
-                students.append({
-                    'student_id': row[0],
-                    'spreadsheet_id': row[1],
-                    'name': row[2],
-                    'sheet_name': row[3] if len(row) > 3 else '行動管理'
-                })
-        return students
+        index = _get_question_index(max_staleness)
     except Exception as e:
-        print(f"Error fetching all students: {e}")
+        print(f"Error fetching unanswered questions: {e}")
+        index = _QUESTION_INDEX
+    if index is None:
         return []
+    return [dict(index['open'][r]) for r in sorted(index['open'])]
+
+# Ranges per values.batchGet call when reading many student tabs at once
+BATCH_GET_CHUNK_SIZE = int(os.environ.get('SHEETS_BATCH_GET_CHUNK_SIZE', '100'))
+# Upper bound on concurrent fan-out batchGet calls in this process
+FANOUT_MAX_WORKERS = int(os.environ.get('SHEETS_FANOUT_MAX_WORKERS', '4'))
+
+_FANOUT_EXECUTOR = None
+_FANOUT_PID = None
+_FANOUT_LOCK = threading.Lock()
 
-def get_unanswered_questions():
+def _fanout_executor():
+    # One pool per process, so its threads, and the Sheets client each keeps
+    # in _CLIENT_LOCAL, outlive a fan-out. A pool inherited across fork()
+    # has no threads behind it, so a new process builds its own.
+    global _FANOUT_EXECUTOR, _FANOUT_PID
+    with _FANOUT_LOCK:
+        if _FANOUT_PID != os.getpid():
+            _FANOUT_EXECUTOR = ThreadPoolExecutor(max_workers=FANOUT_MAX_WORKERS, thread_name_prefix='sheets-fanout')
+            _FANOUT_PID = os.getpid()
+        return _FANOUT_EXECUTOR
+
+def _fetch_range_chunk(spreadsheet_id, ranges, max_staleness):
     """
-    Fetches all questions with status '未回答' or empty status.
+    Reads ranges of one spreadsheet with one values.batchGet.
+    Returns {(spreadsheet_id, range): rows}; ranges that fail are missing.
     """
     service = get_service()
-    if not service: return []
+    if not service:
+        return {}
 
     try:
-        result = service.spreadsheets().values().get(spreadsheetId=SPREADSHEET_ID, range='質問!A2:E').execute()
-        rows = result.get('values', [])
-        
-        questions = []
-        for i, row in enumerate(rows):
-            # Format: Timestamp, StudentID, Question, Status, Reply
-            status = row[3] if len(row) > 3 else "未回答"
-            if status == "未回答" or not status.strip():
-                questions.append({
-                    'row_index': i + 2, # 1-indexed, +header
-                    'timestamp': row[0] if len(row) > 0 else "",
-                    'student_id': row[1] if len(row) > 1 else "",
-                    'question': row[2] if len(row) > 2 else "",
-                    'status': status
-                })
-        return questions
+        rows_per_range = _batch_get_values(service, spreadsheet_id, ranges, max_staleness)
+        return {(spreadsheet_id, r): rows for r, rows in zip(ranges, rows_per_range)}
     except Exception as e:
-        print(f"Error fetching unanswered questions: {e}")
-        return []
+        if len(ranges) == 1:
+            print(f"Error fetching {ranges[0]}: {e}")
+            return {}
+        # One bad range (e.g. a renamed tab) fails the whole batchGet,
+        # so split the chunk in half to isolate it.
+        print(f"Error fetching chunk of {len(ranges)} ranges, splitting: {e}")
+        half = len(ranges) // 2
+        result = _fetch_range_chunk(spreadsheet_id, ranges[:half], max_staleness)
+        result.update(_fetch_range_chunk(spreadsheet_id, ranges[half:], max_staleness))
+        return result
+
+def _range_chunks(requests):
+    # Groups (spreadsheet_id, range) pairs into [(spreadsheet_id, ranges)] batchGet chunks
+    groups = {}
+    for spreadsheet_id, range_name in requests:
+        ranges = groups.setdefault(spreadsheet_id, [])
+        if range_name not in ranges:
+            ranges.append(range_name)
+
+    chunks = []
+    for spreadsheet_id, ranges in groups.items():
+        for i in range(0, len(ranges), BATCH_GET_CHUNK_SIZE):
+            chunks.append((spreadsheet_id, ranges[i:i + BATCH_GET_CHUNK_SIZE]))
+    return chunks
+
+def _fetch_ranges(requests, max_staleness=None):
+    """
+    Reads many (spreadsheet_id, range) pairs. Reads are grouped by spreadsheet and
+    chunked into values.batchGet calls; chunks run on the process's fan-out pool.
+    Returns {(spreadsheet_id, range): rows}; ranges that failed are missing.
+    """
+    chunks = _range_chunks(requests)
+    fetched = {}
+    if len(chunks) <= 1:
+        for spreadsheet_id, ranges in chunks:
+            fetched.update(_fetch_range_chunk(spreadsheet_id, ranges, max_staleness))
+        return fetched
+
+    # Each worker thread gets its own Sheets client from get_service(), and
+    # runs in a copy of the caller's context: its priority, handler name and
+    # request trace. A context can only be entered by one thread, so one each.
+    def fetch(context, chunk):
+        return context.run(_fetch_range_chunk, chunk[0], chunk[1], max_staleness)
+
+    contexts = [contextvars.copy_context() for _ in chunks]
+    for result in _fanout_executor().map(fetch, contexts, chunks):
+        fetched.update(result)
+    return fetched
+
+def _fetch_student_regions(students, regions, max_staleness=None):
+    """
+    Reads the given regions of every student's tab, from the cache where
+    possible and with batched reads otherwise.
+    Returns {index into students: {region: value}}; failed students are missing.
+    """
+    results, requests = _plan_student_regions(students, regions, max_staleness)
+    fetched = _fetch_ranges(requests, max_staleness)
+    return _assemble_student_regions(students, regions, results, fetched)
+
+def _plan_student_regions(students, regions, max_staleness=None):
+    # Returns ({idx: {region: cached value}}, [(spreadsheet_id, range) to read])
+    results = {}
+    requests = []
+    for idx, student in enumerate(students):
+        results[idx] = {}
+        for region in regions:
+            value = _student_cache_get(student['spreadsheet_id'], student['sheet_name'], region, max_staleness)
+            if value is None:
+                requests.append((student['spreadsheet_id'], _tab_range(student['sheet_name'], STUDENT_REGIONS[region][0])))
+            else:
+                results[idx][region] = value
+    return results, requests
+
+def _assemble_student_regions(students, regions, results, fetched):
+    # Fills results in from fetched rows; drops students with a failed read
+    for idx, student in enumerate(students):
+        for region in regions:
+            if region in results[idx]:
+                continue
+            rows = fetched.get((student['spreadsheet_id'], _tab_range(student['sheet_name'], STUDENT_REGIONS[region][0])))
+            if rows is None:
+                break
+            value = STUDENT_REGIONS[region][1](rows)
+            _student_cache_put(student['spreadsheet_id'], student['sheet_name'], region, value)
+            results[idx][region] = value
+        if len(results[idx]) < len(regions):
+            del results[idx]
+        elif 'tasks' in results[idx]:
+            _apply_pending_writes(student['spreadsheet_id'], student['sheet_name'], results[idx]['tasks'])
+    return results
 
+def _fetch_user_infos(students):
+    """
+    Returns {index into students: info} for the header block of every student's tab.
+    """
+    return {idx: r['user_info'] for idx, r in _fetch_student_regions(students, ['user_info']).items()}
+
+@_instrumented
+def get_student_summaries(students=None, max_staleness=None):
+    """
+    Returns one progress summary per student (all students if none given):
+    {'student_id', 'name', 'current_week', 'monthly_goal', 'completed', 'total'}.
+    Students whose tab could not be read get 'error': True.
+    """
+    if students is None:
+        students = get_all_students(max_staleness)
+
+    regions = _fetch_student_regions(students, ['user_info', 'tasks'], max_staleness)
+    return _student_summaries(students, regions)
+
+def _student_summaries(students, regions):
+    summaries = []
+    for idx, student in enumerate(students):
+        summary = {'student_id': student['student_id'], 'name': student['name']}
+        if idx in regions:
+            info = regions[idx]['user_info']
+            tasks = regions[idx]['tasks']
+            summary.update({
+                'current_week': info.get('current_week', ''),
+                'monthly_goal': info.get('monthly_goal', ''),
+                'completed': sum(1 for t in tasks if t['status'] == '完了'),
+                'total': len(tasks)
+            })
+        else:
+            summary['error'] = True
+        summaries.append(summary)
+    return summaries
+
+@_instrumented
 def get_admin_dashboard_data():
     """
-    Aggregates data for the admin dashboard.
+    Aggregates the totals shown on the admin dashboard. The student and
+    question lists are loaded page by page (see get_students_page).
+    """
+    with sheets_priority(PRIORITY_BULK):
+        students = get_all_students()
+        unanswered_questions = get_unanswered_questions()
+
+    return {
+        'total_students': len(students),
+        'total_questions': len(unanswered_questions)
+    }
+
+# --- Admin List Paging ---
+
+MAX_PAGE_SIZE = 100
+STUDENT_SORT_FIELDS = ('student_id', 'name', 'sheet_name', 'week')
+QUESTION_SORT_FIELDS = ('timestamp', 'student_id')
+
+def _parse_sort(sort, fields):
+    """
+    'name' sorts ascending, '-name' descending. Raises ValueError for unknown fields.
+    """
+    descending = sort.startswith('-')
+    field = sort.lstrip('-')
+    if field not in fields:
+        raise ValueError(f"Unknown sort field: {field}")
+    return field, descending
+
+def _paginate(items, page, size):
+    size = max(1, min(size, MAX_PAGE_SIZE))
+    pages = max(1, -(-len(items) // size))
+    page = max(1, min(page, pages))
+    start = (page - 1) * size
+    return items[start:start + size], {'page': page, 'size': size, 'total': len(items), 'pages': pages}
+
+@_instrumented
+def get_students_page(page=1, size=20, sort='student_id', week=None):
+    """
+    Returns one page of the student list:
+    {'students': [...], 'page', 'size', 'total', 'pages'}.
+    Only the students on the page have their tabs read. Filtering and sorting
+    by week use the metrics snapshot, so they lag by up to one refresh.
     """
+    page_students, paging = _select_students_page(page, size, sort, week)
+    paging['students'] = _with_user_infos(page_students, _fetch_user_infos(page_students))
+    return paging
+
+def _select_students_page(page, size, sort, week):
+    # Sorts, filters and slices the roster; no per-student reads
+    field, descending = _parse_sort(sort, STUDENT_SORT_FIELDS)
     students = get_all_students()
-    unanswered_questions = get_unanswered_questions()
-    
-    detailed_students = []
-    
-    for student in students:
-        try:
-            info = get_user_info(student['student_id'])
+
+    if week or field == 'week':
+        snapshot = get_dashboard_metrics_snapshot()
+        weeks = snapshot['weeks'] if snapshot else {}
+        if week:
+            students = [s for s in students if weeks.get(s['student_id']) == week]
+        if field == 'week':
+            students.sort(key=lambda s: _week_sort_key(weeks.get(s['student_id'], UNSTARTED_LABEL)), reverse=descending)
+    if field != 'week':
+        students.sort(key=lambda s: s.get(field, ''), reverse=descending)
+
+    return _paginate(students, page, size)
+
+def _with_user_infos(students, infos):
+    for idx, student in enumerate(students):
+        info = infos.get(idx)
+        if info is not None:
             student['current_week'] = info.get('current_week', '-')
             student['monthly_goal'] = info.get('monthly_goal', '-')
-        except Exception as e:
-            print(f"Error fetching info for {student['student_id']}: {e}")
+        else:
             student['current_week'] = 'Error'
             student['monthly_goal'] = 'Error'
-            
-        detailed_students.append(student)
-        
-    return {
-        'students': detailed_students,
-        'unanswered_questions': unanswered_questions,
-        'total_students': len(students),
-        'total_questions': len(unanswered_questions)
-    }
+    return students
+
+@_instrumented
+def get_questions_page(page=1, size=20, sort='timestamp', student_id=None):
+    """
+    Returns one page of unanswered questions:
+    {'questions': [...], 'page', 'size', 'total', 'pages'}.
+    """
+    field, descending = _parse_sort(sort, QUESTION_SORT_FIELDS)
+    questions = get_unanswered_questions()
+    if student_id:
+        questions = [q for q in questions if q['student_id'] == student_id]
+    # Sheet order is submission order, which is what timestamp sorting means here
+    if field == 'timestamp':
+        if descending:
+            questions.reverse()
+    else:
+        questions.sort(key=lambda q: q[field], reverse=descending)
+
+    page_questions, paging = _paginate(questions, page, size)
+    paging['questions'] = page_questions
+    return paging
 
 CIRCLED_NUMBERS = "①②③④⑤⑥⑦⑧⑨⑩⑪⑫⑬⑭⑮⑯⑰⑱⑲⑳"
 
+# Serialises tab-name allocation within this process. Across workers, a name
+# taken in the meantime makes the whole duplicateSheet batch fail, and the
+# import is retried once against a fresh catalog.
+_ROSTER_WRITE_LOCK = threading.Lock()
+STUDENT_TAB_PREFIX = "行動管理"
+TEMPLATE_SHEET_NAME = '行動管理③'
+MAX_IMPORT_STUDENTS = int(os.environ.get('MAX_IMPORT_STUDENTS', '200'))
+
+def _student_tab_names(titles, count):
+    """
+    Returns the next count free '行動管理X' names after the highest existing one.
+    Uses circled numbers ①-⑳, then plain numbers.
+    """
+    existing_indices = []
+    for title in titles:
+        if title.startswith(STUDENT_TAB_PREFIX):
+            suffix = title.replace(STUDENT_TAB_PREFIX, "").strip()
+            # Check for circled number
+            if suffix and suffix in CIRCLED_NUMBERS:
+                existing_indices.append(CIRCLED_NUMBERS.index(suffix) + 1)
+            # Check for regular number (fallback)
+            elif suffix.isdigit():
+                existing_indices.append(int(suffix))
+
+    next_idx = max(existing_indices) + 1 if existing_indices else 1
+    names = []
+    for idx in range(next_idx, next_idx + count):
+        if idx <= 20:
+            names.append(f"{STUDENT_TAB_PREFIX}{CIRCLED_NUMBERS[idx-1]}")
+        else:
+            names.append(f"{STUDENT_TAB_PREFIX}{idx}") # Fallback to normal number > 20
+    return names
+
+@_instrumented
 def get_next_sheet_name(service, spreadsheet_id):
     """
     Scans existing sheets to find the next available '行動管理X' name.
     Supports circled numbers ①-⑳.
     """
     try:
-        spreadsheet = service.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
-        sheets = spreadsheet.get('sheets', [])
-        existing_indices = []
-        
-        for s in sheets:
-            title = s['properties']['title']
-            if title.startswith("行動管理"):
-                suffix = title.replace("行動管理", "").strip()
-                # Check for circled number
-                if suffix in CIRCLED_NUMBERS:
-                    idx = CIRCLED_NUMBERS.index(suffix) + 1
-                    existing_indices.append(idx)
-                # Check for regular number (fallback)
-                elif suffix.isdigit():
-                    existing_indices.append(int(suffix))
-        
-        next_idx = max(existing_indices) + 1 if existing_indices else 1
-        
-        if next_idx <= 20:
-            return f"行動管理{CIRCLED_NUMBERS[next_idx-1]}"
-        else:
-            return f"行動管理{next_idx}" # Fallback to normal number > 20
-            
+        return _student_tab_names(_sheet_catalog(service, spreadsheet_id), 1)[0]
     except Exception as e:
         print(f"Error determining next sheet name: {e}")
         return f"行動管理_New"
 
+def _template_sheet_id(catalog):
+    # Use '行動管理③' as the source; if it is missing (useful for testing if
+    # someone deleted it) fall back to any '行動管理' tab
+    if TEMPLATE_SHEET_NAME in catalog:
+        return catalog[TEMPLATE_SHEET_NAME]['sheet_id']
+    print(f"Template '{TEMPLATE_SHEET_NAME}' not found. Searching for any '行動管理'.")
+    for title, props in catalog.items():
+        if STUDENT_TAB_PREFIX in title:
+            return props['sheet_id']
+    return None
+
+def _duplicate_template(service, count):
+    """
+    Creates count copies of the template tab, already named, with one
+    spreadsheets.batchUpdate. Returns [(sheet_id, sheet_name)].
+    """
+    for attempt in range(2):
+        invalidate_sheet_catalog()
+        catalog = _sheet_catalog(service)
+        template_id = _template_sheet_id(catalog)
+        if template_id is None:
+            raise RuntimeError("No suitable template sheet found.")
+
+        names = _student_tab_names(catalog, count)
+        requests = [{
+            'duplicateSheet': {
+                'sourceSheetId': template_id,
+                # Append at the end, where copyTo used to put new tabs
+                'insertSheetIndex': len(catalog) + i,
+                'newSheetName': name
+            }
+        } for i, name in enumerate(names)]
+        try:
+            response = _execute(service.spreadsheets().batchUpdate(spreadsheetId=SPREADSHEET_ID, body={'requests': requests}))
+        except Exception as e:
+            # Another worker took one of the names since we read the catalog
+            if attempt == 0 and _http_status(e) == 400 and 'already exists' in str(e):
+                continue
+            raise
+        finally:
+            invalidate_sheet_catalog()
+        return [(reply['duplicateSheet']['properties']['sheetId'], name)
+                for reply, name in zip(response.get('replies', []), names)]
+
+def _delete_tabs(service, sheet_ids):
+    try:
+        _execute(service.spreadsheets().batchUpdate(spreadsheetId=SPREADSHEET_ID, body={
+            'requests': [{'deleteSheet': {'sheetId': sheet_id}} for sheet_id in sheet_ids]
+        }))
+    except Exception as e:
+        print(f"Error removing {len(sheet_ids)} orphaned tabs: {e}")
+    finally:
+        invalidate_sheet_catalog()
+
+@_instrumented
+def create_students(students):
+    """
+    Onboards many students at once:
+    1. Duplicates the template tab once per student, named with the next free
+       circled numbers, in one spreadsheets.batchUpdate.
+    2. Appends all their Master rows with one values.append.
+    students: list of {'student_id': str, 'name': str}.
+    Returns one {'student_id', 'status', 'sheet_name'?, 'message'?} per item,
+    in order. status is 'success', 'invalid' (not created) or 'error'.
+    """
+    results = []
+    accepted = []
+    seen_ids = set()
+    roster = _get_roster()
+    known_ids = roster['configs'] if roster else {}
+    for item in students:
+        item = item if isinstance(item, dict) else {}
+        student_id = str(item.get('student_id') or '').strip()
+        name = str(item.get('name') or '').strip()
+        result = {'student_id': student_id}
+        results.append(result)
+        if not student_id or not name:
+            result.update({'status': 'invalid', 'message': 'Missing name or student_id'})
+        elif student_id in seen_ids or student_id in known_ids:
+            result.update({'status': 'invalid', 'message': 'Duplicate student_id'})
+        else:
+            seen_ids.add(student_id)
+            accepted.append((result, student_id, name))
+
+    if not accepted:
+        return results
+    if len(accepted) > MAX_IMPORT_STUDENTS:
+        for result, _, _ in accepted:
+            result.update({'status': 'invalid', 'message': f'At most {MAX_IMPORT_STUDENTS} students per import'})
+        return results
+
+    service = get_service()
+    tabs = []
+    landed = set()
+    try:
+        if not service:
+            raise RuntimeError("Sheets service unavailable")
+
+        with _ROSTER_WRITE_LOCK:
+            tabs = _duplicate_template(service, len(accepted))
+
+            values = []
+            for (_, student_id, name), (sheet_id, sheet_name) in zip(accepted, tabs):
+                url = f"https://docs.google.com/spreadsheets/d/{SPREADSHEET_ID}/edit#gid={sheet_id}"
+                hyperlink_formula = f'=HYPERLINK("{url}", "{sheet_name}")'
+                values.append([student_id, SPREADSHEET_ID, name, hyperlink_formula])
+
+            try:
+                _execute(service.spreadsheets().values().append(
+                    spreadsheetId=SPREADSHEET_ID,
+                    range='Master!A:D',
+                    valueInputOption='USER_ENTERED',
+                    insertDataOption='INSERT_ROWS',
+                    body={'values': values}
+                ))
+                landed = {student_id for _, student_id, _ in accepted}
+            except Exception as e:
+                print(f"Error appending Master rows for {len(accepted)} students: {e}")
+                landed = _master_rows_landed(e, accepted, tabs)
+
+            if landed is not None:
+                # Without Master rows the new tabs would be unreachable, so drop them.
+                # If we can't tell whether the rows exist, keep the tabs they may point at.
+                orphans = [sheet_id for (_, student_id, _), (sheet_id, _) in zip(accepted, tabs)
+                           if student_id not in landed]
+                if orphans:
+                    _delete_tabs(service, orphans)
+    except Exception as e:
+        print(f"Error creating {len(accepted)} students: {e}")
+        for result, _, _ in accepted:
+            result.update({'status': 'error', 'message': 'Failed to create student'})
+        return results
+    finally:
+        invalidate_roster()
+
+    for (result, student_id, _), (_, sheet_name) in zip(accepted, tabs):
+        if landed is None:
+            result.update({'status': 'error', 'sheet_name': sheet_name,
+                           'message': 'Outcome unknown; check Master before retrying'})
+        elif student_id in landed:
+            result.update({'status': 'success', 'sheet_name': sheet_name})
+        else:
+            result.update({'status': 'error', 'message': 'Failed to create student'})
+    if landed:
+        refresh_dashboard_metrics()
+    return results
+
+def _master_rows_landed(error, accepted, tabs):
+    """
+    Works out which of the accepted students got their Master row despite the
+    append raising error. Returns their IDs, or None if Master can't be read.
+    """
+    status = _http_status(error)
+    if status is not None and 400 <= status < 500:
+        # Rejected outright (bad request, permissions, quota): nothing was written
+        return set()
+    # A 5xx or a timeout may have been applied before it failed, so look
+    roster = _load_roster(max_staleness=0)
+    if roster is None:
+        return None
+    return {student_id for (_, student_id, _), (_, sheet_name) in zip(accepted, tabs)
+            if roster['configs'].get(student_id, {}).get('sheet_name') == sheet_name}
+
+@_instrumented
 def create_new_student(name, student_id):
     """
     1. Copies the '行動管理③' (latest template) sheet.
     2. Renames it to the next available circled number (e.g., '行動管理④').
     3. Adds row to Master sheet.
     """
+    results = create_students([{'name': name, 'student_id': student_id}])
+    return results[0]['status'] == 'success'
+
+@_instrumented
+def delete_students(student_ids):
+    """
+    Deletes students from the Master sheet with one deleteDimension batch.
+    Deletes ALL rows matching each student_id (to handle duplicates).
+    DOES NOT delete the individual student sheets (for safety).
+    Returns one {'student_id', 'status': 'success' | 'not_found' | 'error'} per id, in order.
+    """
+    results = [{'student_id': student_id} for student_id in student_ids]
     service = get_service()
-    if not service: return False
-    
+
     try:
-        # Determine Template: Use '行動管理③' as the source.
-        # If not found, try '99_マスター', else fail.
-        template_name = '行動管理③'
-        
-        spreadsheet = service.spreadsheets().get(spreadsheetId=SPREADSHEET_ID).execute()
-        sheets = spreadsheet.get('sheets', [])
-        template_id = None
-        
-        # Check if intended template exists
-        for s in sheets:
-            if s['properties']['title'] == template_name:
-                template_id = s['properties']['sheetId']
-                break
-        
-        # Fallback if specific template missing (useful for testing if user deleted it)
-        if template_id is None:
-             print(f"Template '{template_name}' not found. Searching for any '行動管理'.")
-             for s in sheets:
-                 if "行動管理" in s['properties']['title']:
-                     template_id = s['properties']['sheetId']
-                     break
+        if not service:
+            raise RuntimeError("Sheets service unavailable")
 
-        if template_id is None:
-            print("No suitable template sheet found.")
-            return False
+        with _ROSTER_WRITE_LOCK:
+            # Row numbers must be current, so re-read Master rather than trusting a stale index.
+            roster = _get_roster(max_age=0)
+            if not roster:
+                raise RuntimeError("Master sheet unavailable")
 
-        # 2. Determine New Name
-        new_sheet_name = get_next_sheet_name(service, SPREADSHEET_ID)
+            # 0-indexed rows for deleteDimension
+            rows_to_delete = set()
+            for result in results:
+                rows = roster['row_numbers'].get(result['student_id'], [])
+                if rows:
+                    rows_to_delete.update(row - 1 for row in rows)
+                else:
+                    print(f"Student ID {result['student_id']} not found in Master sheet.")
+                    result['status'] = 'not_found'
 
-        # 3. Copy the sheet
-        copy_request = service.spreadsheets().sheets().copyTo(
-            spreadsheetId=SPREADSHEET_ID,
-            sheetId=template_id,
-            body={'destinationSpreadsheetId': SPREADSHEET_ID}
-        ).execute()
-        
-        new_sheet_id = copy_request['sheetId']
-        
-        # 4. Rename the new sheet
-        update_body = {
-            'requests': [{
-                'updateSheetProperties': {
-                    'properties': {
-                        'sheetId': new_sheet_id,
-                        'title': new_sheet_name,
-                    },
-                    'fields': 'title'
-                }
-            }]
-        }
-        service.spreadsheets().batchUpdate(spreadsheetId=SPREADSHEET_ID, body=update_body).execute()
-        
-        # 5. Add to Master sheet
-        url = f"https://docs.google.com/spreadsheets/d/{SPREADSHEET_ID}/edit#gid={new_sheet_id}"
-        hyperlink_formula = f'=HYPERLINK("{url}", "{new_sheet_name}")'
-        
-        values = [[student_id, SPREADSHEET_ID, name, hyperlink_formula]]
-        append_body = {'values': values}
-        
-        service.spreadsheets().values().append(
-            spreadsheetId=SPREADSHEET_ID,
-            range='Master!A:D',
-            valueInputOption='USER_ENTERED',
-            insertDataOption='INSERT_ROWS',
-            body=append_body
-        ).execute()
-        
-        return True
+            if rows_to_delete:
+                master_sheet = _sheet_catalog(service).get('Master')
+                master_sheet_id = master_sheet['sheet_id'] if master_sheet else 0
+
+                # Sort in descending order to avoid index shifting issues when deleting multiple rows
+                requests = []
+                for row_idx in sorted(rows_to_delete, reverse=True):
+                    requests.append({
+                        'deleteDimension': {
+                            'range': {
+                                'sheetId': master_sheet_id,
+                                'dimension': 'ROWS',
+                                'startIndex': row_idx,
+                                'endIndex': row_idx + 1
+                            }
+                        }
+                    })
 
+                _execute(service.spreadsheets().batchUpdate(spreadsheetId=SPREADSHEET_ID, body={'requests': requests}))
+                print(f"Deleted {len(requests)} rows from Master sheet (Rows: {sorted(r + 1 for r in rows_to_delete)}).")
+
+                # Row numbers have shifted, so drop the whole index
+                invalidate_roster()
+                refresh_dashboard_metrics()
     except Exception as e:
-        print(f"Error creating new student: {e}")
-        return False
+        print(f"Error deleting students: {e}")
+        for result in results:
+            result.setdefault('status', 'error')
+        return results
 
+    for result in results:
+        result.setdefault('status', 'success')
+    return results
+
+@_instrumented
 def delete_student(student_id):
     """
     Deletes a student from the Master sheet.
     Deletes ALL rows matching the student_id (to handle duplicates).
     DOES NOT delete the individual student sheet (for safety).
     """
-    service = get_service()
-    if not service: return False
+    return delete_students([student_id])[0]['status'] == 'success'
+
+# --- Warm-up ---
+# With SHEETS_WARMUP enabled, each worker starts a background warm-up as soon as
+# it is forked (see gunicorn.conf.py): it builds the Sheets client, loads the
+# Master roster, the tab catalog and the question index, then prefetches the
+# tabs of the students who used their dashboard most recently. Those are
+# remembered in RECENT_STUDENTS_PATH so they survive restarts. /healthz reports
+# 503 until the warm-up has finished.
 
+WARMUP_ENABLED = os.environ.get('SHEETS_WARMUP', '').lower() in ('1', 'true', 'yes')
+WARMUP_STUDENTS = int(os.environ.get('SHEETS_WARMUP_STUDENTS', '100'))
+RECENT_STUDENTS_PATH = os.environ.get('RECENT_STUDENTS_PATH', 'recent_students.json')
+RECENT_STUDENTS_SAVE_INTERVAL = 60
+
+_RECENT_STUDENTS = OrderedDict()  # student_id -> last dashboard load (epoch seconds)
+_RECENT_LOCK = threading.Lock()
+_RECENT_SAVED_AT = 0.0
+_WARMUP_STATUS = {'state': 'pending' if WARMUP_ENABLED else 'disabled'}
+_WARMUP_LOCK = threading.Lock()
+
+def _load_recent_students():
     try:
-        # 1. Find the row indices of the student in Master sheet
-        result = service.spreadsheets().values().get(spreadsheetId=SPREADSHEET_ID, range='Master!A:A').execute()
-        rows = result.get('values', [])
-        
-        rows_to_delete = []
-        for i, row in enumerate(rows):
-            if row and row[0] == student_id:
-                rows_to_delete.append(i)
-        
-        if not rows_to_delete:
-            print(f"Student ID {student_id} not found in Master sheet.")
-            return False
+        with open(RECENT_STUDENTS_PATH, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"Error reading {RECENT_STUDENTS_PATH}: {e}")
+        return {}
 
-        # 2. Delete the rows using batchUpdate with deleteDimension
-        # Sort in descending order to avoid index shifting issues when deleting multiple rows
-        rows_to_delete.sort(reverse=True)
-        
-        spreadsheet = service.spreadsheets().get(spreadsheetId=SPREADSHEET_ID).execute()
-        master_sheet_id = 0
-        for s in spreadsheet.get('sheets', []):
-            if s['properties']['title'] == 'Master':
-                master_sheet_id = s['properties']['sheetId']
-                break
+def _save_recent_students():
+    global _RECENT_SAVED_AT
+    with _RECENT_LOCK:
+        _RECENT_SAVED_AT = time.time()
+        if not _RECENT_STUDENTS:
+            return
+        # Other workers save to the same file, so merge rather than overwrite
+        merged = _load_recent_students()
+        for student_id, seen_at in _RECENT_STUDENTS.items():
+            merged[student_id] = max(seen_at, merged.get(student_id, 0))
+        recent = dict(sorted(merged.items(), key=lambda item: item[1], reverse=True)[:WARMUP_STUDENTS])
+        try:
+            tmp_path = f"{RECENT_STUDENTS_PATH}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(recent, f)
+            os.replace(tmp_path, RECENT_STUDENTS_PATH)
+        except Exception as e:
+            print(f"Error saving {RECENT_STUDENTS_PATH}: {e}")
 
-        requests = []
-        for row_idx in rows_to_delete:
-            requests.append({
-                'deleteDimension': {
-                    'range': {
-                        'sheetId': master_sheet_id,
-                        'dimension': 'ROWS',
-                        'startIndex': row_idx,
-                        'endIndex': row_idx + 1
-                    }
-                }
-            })
+def note_student_active(student_id):
+    """
+    Records a dashboard load, so the next warm-up prefetches this student.
+    """
+    if not WARMUP_ENABLED:
+        return
+    with _RECENT_LOCK:
+        _RECENT_STUDENTS[student_id] = time.time()
+        _RECENT_STUDENTS.move_to_end(student_id)
+        while len(_RECENT_STUDENTS) > WARMUP_STUDENTS:
+            _RECENT_STUDENTS.popitem(last=False)
+        due = time.time() - _RECENT_SAVED_AT > RECENT_STUDENTS_SAVE_INTERVAL
+    if due:
+        _save_recent_students()
 
-        request_body = {'requests': requests}
+def recent_student_ids(limit=WARMUP_STUDENTS):
+    """
+    Returns the IDs of the students who loaded their dashboard most recently, newest first.
+    """
+    merged = _load_recent_students()
+    with _RECENT_LOCK:
+        for student_id, seen_at in _RECENT_STUDENTS.items():
+            merged[student_id] = max(seen_at, merged.get(student_id, 0))
+    return [sid for sid, _ in sorted(merged.items(), key=lambda item: item[1], reverse=True)[:limit]]
 
-        service.spreadsheets().batchUpdate(spreadsheetId=SPREADSHEET_ID, body=request_body).execute()
-        print(f"Deleted student {student_id} from Master sheet (Rows: {[r+1 for r in rows_to_delete]}).")
-        
-        # Clear cache
-        if student_id in STUDENT_CONFIG_CACHE:
-            del STUDENT_CONFIG_CACHE[student_id]
-            
-        return True
+if WARMUP_ENABLED:
+    atexit.register(_save_recent_students)
 
-    except Exception as e:
-        print(f"Error deleting student: {e}")
-        return False
+@_instrumented
+def warm_up():
+    """
+    Loads the client, roster, tab catalog and question index, then the tabs of
+    recently active students (batched by _fetch_ranges). Returns the number of
+    students prefetched. Raises if Sheets can't be reached.
+    """
+    service = get_service()
+    if not service:
+        raise RuntimeError("Sheets service unavailable")
+
+    with sheets_priority(PRIORITY_BULK):
+        roster = _get_roster()
+        if not roster:
+            raise RuntimeError("Could not load the Master roster")
+        _sheet_catalog(service)
+        _get_question_index()
+
+        by_id = {s['student_id']: s for s in roster['students']}
+        students = [dict(by_id[sid]) for sid in recent_student_ids() if sid in by_id]
+        regions = _fetch_student_regions(students, ['user_info', 'tasks'])
+    return len(regions)
+
+def start_warm_up():
+    """
+    Runs warm_up() on a background thread, once per process. A no-op unless
+    SHEETS_WARMUP is set.
+    """
+    if not WARMUP_ENABLED:
+        return
+
+    def run():
+        started_at = time.time()
+        with _WARMUP_LOCK:
+            _WARMUP_STATUS.clear()
+            _WARMUP_STATUS.update({'state': 'running', 'started_at': started_at})
+        try:
+            students = warm_up()
+            update = {'state': 'ready', 'students': students}
+        except Exception as e:
+            # Don't hold the worker out of rotation: it can still serve, just colder
+            print(f"Error warming up: {e}")
+            update = {'state': 'failed', 'error': str(e)}
+        update['seconds'] = round(time.time() - started_at, 2)
+        with _WARMUP_LOCK:
+            _WARMUP_STATUS.update(update)
+
+    start_once('sheets-warm-up', run)
+
+def get_warm_up_status():
+    """
+    Returns {'state': 'disabled' | 'pending' | 'running' | 'ready' | 'failed', ...}.
+    """
+    with _WARMUP_LOCK:
+        status = dict(_WARMUP_STATUS)
+    status['ready'] = status['state'] in ('disabled', 'ready', 'failed')
+    return status
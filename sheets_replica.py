@@ -0,0 +1,223 @@
+"""
+Local SQLite mirror of Google Sheets ranges.
+
+Each mirrored range is stored as the raw rows returned by the Sheets API,
+together with the time the read that produced it started. sheets_handler
+serves reads from here when the copy is fresh enough and keeps it up to
+date with a periodic batched sync.
+
+The same file carries a log of cache invalidations, so every worker process
+on the node can drop what another worker's write made stale.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+_LOCAL = threading.local()
+_PATH = None
+# Invalidations are kept this long; longer than any in-memory cache TTL
+INVALIDATION_RETENTION_SECONDS = 3600
+# Last invalidation this process has seen: {'pid': int, 'seq': int}
+_CURSOR = {'pid': None, 'seq': 0}
+_CURSOR_LOCK = threading.Lock()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ranges (
+    spreadsheet_id TEXT NOT NULL,
+    range_name TEXT NOT NULL,
+    values_json TEXT,
+    synced_at REAL NOT NULL DEFAULT 0,
+    invalidated_at REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (spreadsheet_id, range_name)
+);
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS invalidations (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    origin INTEGER NOT NULL,
+    scope TEXT NOT NULL,
+    key TEXT,
+    created_at REAL NOT NULL
+);
+"""
+
+def configure(path):
+    """
+    Enables the replica at the given database path (None disables it).
+    """
+    global _PATH
+    _PATH = path or None
+    if _PATH:
+        directory = os.path.dirname(os.path.abspath(_PATH))
+        os.makedirs(directory, exist_ok=True)
+        _connection()
+
+def enabled():
+    return _PATH is not None
+
+def _connection():
+    # sqlite3 connections can't be shared between threads, so keep one per thread
+    conn = getattr(_LOCAL, 'conn', None)
+    if conn is not None and _LOCAL.path == _PATH and _LOCAL.pid == os.getpid():
+        return conn
+    conn = sqlite3.connect(_PATH, timeout=10, isolation_level=None)
+    # WAL lets readers in other workers carry on while the sync job writes
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.executescript(_SCHEMA)
+    _LOCAL.conn = conn
+    _LOCAL.path = _PATH
+    _LOCAL.pid = os.getpid()
+    _LOCAL.data_version = None
+    return conn
+
+def get_range(spreadsheet_id, range_name, max_staleness):
+    """
+    Returns the mirrored rows of a range if they were synced within
+    max_staleness seconds, otherwise None.
+    """
+    if not enabled():
+        return None
+    row = _connection().execute(
+        'SELECT values_json, synced_at FROM ranges WHERE spreadsheet_id = ? AND range_name = ?',
+        (spreadsheet_id, range_name)
+    ).fetchone()
+    if row is None or row[0] is None or time.time() - row[1] > max_staleness:
+        return None
+    return json.loads(row[0])
+
+def put_ranges(spreadsheet_id, rows_by_range, read_started_at):
+    """
+    Stores freshly read ranges. read_started_at is when the read was issued:
+    a range invalidated after that point keeps its invalidation, since the
+    rows read may predate the write that invalidated it.
+    """
+    if not enabled() or not rows_by_range:
+        return
+    conn = _connection()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        conn.executemany(
+            """
+            INSERT INTO ranges (spreadsheet_id, range_name, values_json, synced_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (spreadsheet_id, range_name) DO UPDATE
+                SET values_json = excluded.values_json, synced_at = excluded.synced_at
+                WHERE excluded.synced_at > ranges.invalidated_at
+            """,
+            [(spreadsheet_id, range_name, json.dumps(rows, ensure_ascii=False), read_started_at)
+             for range_name, rows in rows_by_range.items()]
+        )
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+
+def invalidate(spreadsheet_id, range_names):
+    """
+    Marks ranges as stale after a write, so the next read goes to Sheets.
+    """
+    if not enabled() or not range_names:
+        return
+    now = time.time()
+    _connection().executemany(
+        """
+        INSERT INTO ranges (spreadsheet_id, range_name, values_json, synced_at, invalidated_at)
+        VALUES (?, ?, NULL, 0, ?)
+        ON CONFLICT (spreadsheet_id, range_name) DO UPDATE
+            SET values_json = NULL, invalidated_at = excluded.invalidated_at
+        """,
+        [(spreadsheet_id, range_name, now) for range_name in range_names]
+    )
+
+def try_acquire_lease(name, owner, ttl):
+    """
+    Takes (or renews) a named lease for ttl seconds. Returns True if owner holds it.
+    Used so only one worker on the node runs the sync job.
+    """
+    if not enabled():
+        return False
+    now = time.time()
+    conn = _connection()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        row = conn.execute('SELECT owner, expires_at FROM leases WHERE name = ?', (name,)).fetchone()
+        if row is not None and row[0] != owner and row[1] > now:
+            conn.execute('COMMIT')
+            return False
+        conn.execute(
+            'INSERT OR REPLACE INTO leases (name, owner, expires_at) VALUES (?, ?, ?)',
+            (name, owner, now + ttl)
+        )
+        conn.execute('COMMIT')
+        return True
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+
+def publish_invalidation(scope, key=None):
+    """
+    Records that the cache scope (e.g. 'roster') changed, optionally for one
+    key, so the other processes on the node drop their copy.
+    """
+    if not enabled():
+        return
+    now = time.time()
+    conn = _connection()
+    seq = conn.execute(
+        'INSERT INTO invalidations (origin, scope, key, created_at) VALUES (?, ?, ?, ?)',
+        (os.getpid(), scope, key, now)
+    ).lastrowid
+    if seq % 1000 == 0:
+        conn.execute('DELETE FROM invalidations WHERE created_at < ?', (now - INVALIDATION_RETENTION_SECONDS,))
+
+def poll_invalidations():
+    """
+    Returns [(scope, key)] published by other processes since this process
+    last polled. The first poll in a process only sets its starting point.
+    Cheap when nothing has been committed since the calling thread's last poll.
+    """
+    if not enabled():
+        return []
+    conn = _connection()
+    pid = os.getpid()
+    # data_version changes whenever another connection commits to the database
+    version = conn.execute('PRAGMA data_version').fetchone()[0]
+    if _CURSOR['pid'] == pid and _LOCAL.data_version == version:
+        return []
+
+    with _CURSOR_LOCK:
+        if _CURSOR['pid'] != pid:
+            row = conn.execute('SELECT MAX(seq) FROM invalidations').fetchone()
+            _CURSOR.update(pid=pid, seq=row[0] or 0)
+            rows = []
+        else:
+            rows = conn.execute(
+                'SELECT seq, origin, scope, key FROM invalidations WHERE seq > ? ORDER BY seq',
+                (_CURSOR['seq'],)
+            ).fetchall()
+            if rows:
+                _CURSOR['seq'] = rows[-1][0]
+    _LOCAL.data_version = version
+    return [(scope, key) for _, origin, scope, key in rows if origin != pid]
+
+def stats():
+    if not enabled():
+        return {'enabled': False}
+    row = _connection().execute(
+        'SELECT COUNT(*), SUM(values_json IS NOT NULL), MIN(synced_at), MAX(synced_at) FROM ranges'
+    ).fetchone()
+    now = time.time()
+    return {
+        'enabled': True,
+        'path': _PATH,
+        'ranges': row[0],
+        'valid_ranges': row[1] or 0,
+        'oldest_age': round(now - row[2], 1) if row[2] else None,
+        'newest_age': round(now - row[3], 1) if row[3] else None,
+    }
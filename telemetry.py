@@ -0,0 +1,157 @@
+"""
+Counters and histograms for this worker, exposed at /metrics in the
+Prometheus text format.
+
+    CALLS = telemetry.counter('sheets_api_calls_total', 'Sheets API calls', ['handler', 'operation', 'outcome'])
+    CALLS.inc('get_tasks', 'values.batchGet', 'ok')
+
+Every gunicorn worker keeps its own series, so a scrape through the load
+balancer reports the worker that answered it. Counters only ever go up within
+a process; Prometheus treats a restarted worker as a counter reset.
+
+It also keeps a per-request trace: between start_trace() and end_trace(),
+record_span() collects one dict per Sheets call made on behalf of the
+request, including from fan-out threads that run in a copy of its context.
+"""
+import contextvars
+import threading
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Upper bounds in seconds, from a cache hit to a throttled, retried Sheets call
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_METRICS = []
+_LOCK = threading.Lock()
+_TRACE = contextvars.ContextVar('telemetry_trace', default=None)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class _Counter:
+    type = 'counter'
+
+    def __init__(self, name, documentation, labels):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{_format_labels(self.labels, labels)} {_format_value(value)}"
+
+class _Histogram:
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labels, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._values = {}  # labels -> [per-bucket counts, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * len(self.buckets), 0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+
+    def samples(self):
+        with self._lock:
+            values = sorted((labels, list(counts), total) for labels, (counts, total) in self._values.items())
+        for labels, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = (('le', _format_value(bound)),)
+                yield f"{self.name}_bucket{_format_labels(self.labels, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labels, labels)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labels, labels)} {cumulative}"
+
+def _register(metric):
+    with _LOCK:
+        for existing in _METRICS:
+            # A module imported twice (app.py run as __main__) gets the same series
+            if existing.name == metric.name and existing.type == metric.type:
+                return existing
+            if existing.name == metric.name:
+                raise ValueError(f"Metric {metric.name} is already registered as a {existing.type}")
+        _METRICS.append(metric)
+    return metric
+
+def counter(name, documentation, labels=()):
+    """
+    Registers a counter. Increment it with .inc(*label_values, amount=1).
+    """
+    return _register(_Counter(name, documentation, labels))
+
+def histogram(name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+    """
+    Registers a histogram. Record with .observe(value, *label_values).
+    """
+    return _register(_Histogram(name, documentation, labels, buckets))
+
+def render():
+    """
+    Returns every registered metric in the Prometheus text exposition format.
+    """
+    with _LOCK:
+        metrics = list(_METRICS)
+    lines = []
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        lines.extend(metric.samples())
+    return '\n'.join(lines) + '\n'
+
+# --- Request Traces ---
+
+def start_trace():
+    """
+    Starts collecting spans in the current context. Returns a token for end_trace().
+    """
+    return _TRACE.set([])
+
+def end_trace(token):
+    """
+    Stops collecting and returns the spans recorded since start_trace().
+    """
+    spans = _TRACE.get() or []
+    _TRACE.reset(token)
+    return spans
+
+def tracing():
+    return _TRACE.get() is not None
+
+def record_span(span):
+    trace = _TRACE.get()
+    if trace is not None:
+        # list.append is atomic, so fan-out threads can share the trace
+        trace.append(span)
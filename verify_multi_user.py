@@ -22,9 +22,8 @@ def verify_multi_user():
     # ... (omitted write logic) ...
 
     # Invalidate cache
-    from sheets_handler import STUDENT_CONFIG_CACHE
-    if 'student_id_002' in STUDENT_CONFIG_CACHE:
-        del STUDENT_CONFIG_CACHE['student_id_002']
+    from sheets_handler import invalidate_roster
+    invalidate_roster('student_id_002')
 
     # 3. Verify student_id_002 Config
     print("\n--- Checking student_id_002 ---")